@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from config import FRAME_DIR
+from logformat import Color, setup_logging
+from main import upload_frames, upload_frames_concurrent, upload_frames_batched, frame_source
+from mock_graph import MockGraphServer, MockGraphConfig, distribution
+from ratelimit import TokenBucket
+from uploader import Uploader, UploadStats
+
+# Effectively no rate limit, benchmarks measure the transport and not the pacing
+UNLIMITED = 1e9
+
+# Import time the entry points may spend on their own modules before doing any work
+STARTUP_BUDGET_MS = 50
+# Modules only a real upload, frame manifest, metrics server or profile should load
+HEAVY_MODULES = ('requests', 'urllib3', 'sqlite3', 'http.server', 'cProfile', 'pstats')
+
+
+def write_frame(path, size):
+    with open(path, 'wb') as frame_file:
+        frame_file.write(b'\xff\xd8' + os.urandom(max(0, size - 4)) + b'\xff\xd9')
+
+
+# Upload the same frame `count` times with requests' in-memory multipart encoding and
+# with the streamed body, reporting wall time, CPU time and peak traced allocations.
+def bench_multipart(args):
+    server = MockGraphServer().start()
+    base_url = server.url
+    results = {'frame_bytes': args.size, 'count': args.count}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_source = os.path.join(tmp, 'frame_0001.jpg')
+        write_frame(image_source, args.size)
+
+        for name, stream in (('in_memory', False), ('streamed', True)):
+            with Uploader(base_url=base_url, limiter=TokenBucket(UNLIMITED), stream=stream) as uploader:
+                uploader.upload_photo(image_source, 'warm up')
+
+                wall_started = time.perf_counter()
+                cpu_started = time.process_time()
+                for _ in range(args.count):
+                    uploader.upload_photo(image_source, 'benchmark')
+                wall = time.perf_counter() - wall_started
+                cpu = time.process_time() - cpu_started
+
+                # Measured separately, tracing allocations would skew the timings
+                tracemalloc.start()
+                uploader.upload_photo(image_source, 'benchmark')
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            results[name] = {
+                'seconds': round(wall, 4),
+                'cpu_seconds_per_upload': round(cpu / args.count, 6),
+                'uploads_per_second': round(args.count / wall, 2),
+                'peak_traced_bytes': peak,
+            }
+
+    server.shutdown()
+    return {'multipart': results}
+
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def comma_list(cast):
+    return lambda value: [cast(item) for item in value.split(',') if item]
+
+
+# Upload-loop settings of each mode compared by the suite
+MODES = {
+    'sequential': {'keep_alive': False},
+    'pooled': {'keep_alive': True},
+    'concurrent': {'keep_alive': True},
+    'batched': {'keep_alive': True},
+}
+
+
+# One scenario, run in a child process so its CPU time and peak RSS are its own.
+# Frames are written to FRAME_DIR of a scratch directory, as upload_frames expects.
+def run_scenario(args):
+    scenario = json.loads(args.scenario)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.mkdir(FRAME_DIR)
+        for i in range(1, scenario['frames'] + 1):
+            write_frame(frame_source(f"{i:04}"), scenario['size'])
+
+        stats = UploadStats(keep_latencies=True)
+        # Concurrent mode publishes from the main thread while the workers stage frames
+        uploader = Uploader(base_url=scenario['base_url'], pool_size=scenario['concurrency'] + 1,
+                            keep_alive=MODES[scenario['mode']]['keep_alive'], limiter=TokenBucket(UNLIMITED),
+                            stats=stats)
+        rusage_started = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        with uploader:
+            if scenario['mode'] == 'concurrent':
+                upload_frames_concurrent(1, scenario['frames'], uploader, scenario['concurrency'])
+            elif scenario['mode'] == 'batched':
+                upload_frames_batched(1, scenario['frames'], uploader, scenario['batch'])
+            else:
+                upload_frames(1, scenario['frames'], uploader, prefetch=scenario['prefetch'])
+        wall = time.perf_counter() - started
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+        uploaded = scenario['frames'] - len(os.listdir(FRAME_DIR))
+
+    return {
+        'seconds': wall,
+        'frames_uploaded': uploaded,
+        'requests': stats.requests,
+        'connections': stats.connects,
+        'latencies': stats.latencies,
+        'cpu_seconds': (rusage.ru_utime - rusage_started.ru_utime) + (rusage.ru_stime - rusage_started.ru_stime),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_bytes': rusage.ru_maxrss * 1024,
+    }
+
+
+# Run every mode over every combination of frame count, frame size and concurrency
+# against an in-process mock endpoint, each scenario in its own interpreter.
+def bench_upload(args):
+    config = MockGraphConfig(args.latency, args.error_rate, quota=10 ** 9)
+    server = MockGraphServer(config).start()
+    results = []
+
+    for mode, frames, size, concurrency in itertools.product(args.modes, args.frames, args.sizes, args.concurrency):
+        if mode != 'concurrent' and concurrency != args.concurrency[0]:
+            continue
+        scenario = {
+            'mode': mode, 'frames': frames, 'size': size, 'base_url': server.url, 'batch': args.batch,
+            'prefetch': args.prefetch, 'concurrency': concurrency if mode == 'concurrent' else 1,
+        }
+        received = server.stats()['bytes_received']
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '_scenario', json.dumps(scenario)],
+                               check=True, capture_output=True, text=True)
+        run = json.loads(child.stdout)
+        sent = server.stats()['bytes_received'] - received
+        latencies = run['latencies']
+
+        results.append({
+            'mode': mode,
+            'frames': frames,
+            'frame_bytes': size,
+            'concurrency': scenario['concurrency'],
+            'frames_uploaded': run['frames_uploaded'],
+            'requests': run['requests'],
+            'connections': run['connections'],
+            'seconds': round(run['seconds'], 4),
+            'frames_per_second': round(run['frames_uploaded'] / run['seconds'], 2),
+            'bytes_per_second': round(sent / run['seconds']),
+            'request_latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 2),
+                'p95': round(percentile(latencies, 95) * 1000, 2),
+                'p99': round(percentile(latencies, 99) * 1000, 2),
+            },
+            'cpu_seconds': round(run['cpu_seconds'], 4),
+            'peak_rss_bytes': run['peak_rss_bytes'],
+        })
+
+    server.shutdown()
+    return {'upload': {'latency': args.latency_spec, 'error_rate': args.error_rate, 'results': results}}
+
+
+# Per-frame cost of the upload log line: the old eager f-string with embedded colors and a
+# second response.json() parse, against lazy %-style records with DEBUG off, as text and as JSON.
+def bench_logging(args):
+    body_text = json.dumps({'id': '1234567890', 'post_id': '1000_1234567890'})
+    body = json.loads(body_text)
+    num = '0001'
+
+    def eager():
+        logging.debug(f"{Color.BOLD}{Color.GREEN}Frame {num} Uploaded{Color.RESET}. {json.loads(body_text)}")
+
+    def lazy():
+        logging.debug("Frame %s Uploaded. %s", num, body, extra={'event': 'uploaded', 'frame': num})
+
+    cases = (
+        ('eager_disabled', eager, logging.INFO, 'text'),
+        ('lazy_disabled', lazy, logging.INFO, 'text'),
+        ('eager_text', eager, logging.DEBUG, 'text'),
+        ('lazy_text', lazy, logging.DEBUG, 'text'),
+        ('lazy_json', lazy, logging.DEBUG, 'json'),
+    )
+    results = {'count': args.count}
+    for name, log, level, log_format in cases:
+        setup_logging(level, log_format, stream=io.StringIO())
+        seconds = min(timeit.repeat(log, number=args.count, repeat=args.repeat))
+        results[name] = {'ns_per_frame': round(seconds / args.count * 1e9, 1)}
+    return {'logging': results}
+
+
+# Parse -X importtime output into {module: cumulative µs} for every module and for the
+# top-level ones, which are the modules the command imported itself
+def parse_importtime(stderr):
+    modules, top_level = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative)
+    return modules, top_level
+
+
+# Time a command's startup: its wall time, and the import time of the modules it loads on
+# top of a bare interpreter (site, encodings and .pth hooks are not the scripts' doing)
+def measure_startup(command, repeat, cwd, baseline=()):
+    walls, imports = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=cwd, capture_output=True)
+        walls.append(time.perf_counter() - started)
+        child = subprocess.run(command[:1] + ['-X', 'importtime'] + command[1:], cwd=cwd, capture_output=True,
+                               text=True)
+        modules, top_level = parse_importtime(child.stderr)
+        own = {name: us for name, us in top_level.items() if name not in baseline}
+        imports.append(sum(own.values()))
+    slowest = sorted(own.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {
+        'wall_ms': round(statistics.median(walls) * 1000, 2),
+        'import_ms': round(statistics.median(imports) / 1000, 2),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in modules],
+        'slowest_imports_ms': {name: round(us / 1000, 2) for name, us in slowest},
+    }
+
+
+# Cold start of the CLIs in the cases that should never reach the network: --help and a
+# command line rejected by validation. Fails (exit status 1) when a case imports a heavy
+# module or its own imports take longer than the budget.
+def bench_importtime(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    baseline_modules, _ = parse_importtime(subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                                                          capture_output=True, text=True).stderr)
+    interpreter = measure_startup([sys.executable, '-c', 'pass'], args.repeat, here)
+    cases = {
+        'main_help': [os.path.join(here, 'main.py'), '--help'],
+        # No --start and an empty journal to resume from
+        'main_invalid': [os.path.join(here, 'main.py'), '--journal', os.devnull],
+        'frame_help': [os.path.join(here, 'frame.py'), '--help'],
+    }
+
+    results = {'budget_ms': args.budget_ms, 'interpreter_wall_ms': interpreter['wall_ms'], 'cases': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, command in cases.items():
+            case = measure_startup([sys.executable] + command, args.repeat, tmp, set(baseline_modules))
+            case['within_budget'] = case['import_ms'] <= args.budget_ms and not case['heavy_modules']
+            results['cases'][name] = case
+    args.failed = not all(case['within_budget'] for case in results['cases'].values())
+    return {'importtime': results}
+
+
+def setup_argument_parser():
+    parser = argparse.ArgumentParser(description='Uploader benchmarks against a local mock Graph API')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    multipart = commands.add_parser('multipart', help='Streamed vs in-memory multipart bodies')
+    multipart.add_argument('--size', metavar='BYTES', default=2 * 1024 * 1024, type=int, help='Frame size')
+    multipart.add_argument('--count', metavar='N', default=50, type=int, help='Uploads per transport')
+    multipart.set_defaults(run=bench_multipart)
+
+    logs = commands.add_parser('logging', help='Per-frame logging overhead, eager vs lazy and text vs JSON')
+    logs.add_argument('--count', metavar='N', default=100000, type=int, help='Log calls per timing')
+    logs.add_argument('--repeat', metavar='N', default=5, type=int, help='Timings per case, the best is kept')
+    logs.set_defaults(run=bench_logging)
+
+    importtime = commands.add_parser('importtime', help='Cold-start import time of the CLIs, against a budget')
+    importtime.add_argument('--repeat', metavar='N', default=5, type=int, help='Runs per case, the median is kept')
+    importtime.add_argument('--budget-ms', metavar='MS', default=STARTUP_BUDGET_MS, type=float,
+                            help='Import time allowed per case; exits with status 1 when a case is over it')
+    importtime.set_defaults(run=bench_importtime)
+
+    upload = commands.add_parser('upload', help='End-to-end upload modes over a grid of workloads')
+    upload.add_argument('--modes', metavar='sequential,pooled', default=list(MODES), type=comma_list(str),
+                        help=f"Comma-separated modes out of {', '.join(MODES)}")
+    upload.add_argument('--frames', metavar='50,200', default=[50], type=comma_list(int), help='Frame counts')
+    upload.add_argument('--sizes', metavar='BYTES,...', default=[250 * 1024], type=comma_list(int),
+                        help='Frame sizes')
+    upload.add_argument('--concurrency', metavar='2,4,8', default=[4], type=comma_list(int),
+                        help='Concurrency levels for the concurrent mode')
+    upload.add_argument('--batch', metavar='N', default=50, type=int, help='Frames per request in batched mode')
+    upload.add_argument('--prefetch', metavar='K', default=0, type=int,
+                        help='Prefetch depth for the sequential and pooled modes')
+    upload.add_argument('--latency', dest='latency_spec', metavar='fixed:0.05', default='fixed:0.05',
+                        help='Mock response delay distribution, see mock_graph.py --help')
+    upload.add_argument('--error-rate', metavar='0.0', default=0.0, type=float,
+                        help='Share of mock requests failing with a transient error')
+    upload.add_argument('--output', metavar='results.json', help='Also write the JSON results to this file')
+    upload.set_defaults(run=bench_upload)
+
+    scenario = commands.add_parser('_scenario')
+    scenario.add_argument('scenario')
+    scenario.set_defaults(run=run_scenario)
+
+    args = parser.parse_args()
+    if args.command == 'upload':
+        unknown = set(args.modes) - set(MODES)
+        if unknown:
+            parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+        args.latency = distribution(args.latency_spec)
+    return args
+
+
+if __name__ == "__main__":
+    args = setup_argument_parser()
+    results = json.dumps(args.run(args), indent=2)
+    if getattr(args, 'output', None):
+        with open(args.output, 'w') as output_file:
+            output_file.write(results + '\n')
+    print(results)
+    if getattr(args, 'failed', False):
+        sys.exit(1)
@@ -1,2 +1,40 @@
 ACCESS_TOKEN = ''  # Replace with your actual access token
 CAPTION_TEMPLATE = "Serial Experiments Lain Eps 1 [Frame {num}/1437]"
+
+GRAPH_API_URL = 'https://graph.facebook.com/v21.0'
+POOL_SIZE = 4  # Connections kept open per host by the uploader session
+KEEP_ALIVE = True  # Reuse connections between frames instead of reconnecting
+STAGING_FILE = './staged.json'  # Photo IDs of frames uploaded but not yet published
+BATCH_SIZE = 50  # Graph API limit on operations per batch request
+RATE_LIMIT = 1 / 3  # Initial requests per second, the old fixed 3 second pause
+RATE_LIMIT_MIN = 1 / 60  # Requests per second once the API reports we are throttled
+RATE_LIMIT_MAX = 2  # Requests per second the limiter never exceeds
+RATE_LIMIT_STEP = 0.05  # Requests per second added after each response with headroom
+RATE_LIMIT_BURST = 1  # Requests that may be sent back to back after an idle period
+TARGET_USAGE = 80  # Quota usage percentage (from the usage headers) to stay under
+RETRY_MAX_ATTEMPTS = 5  # Attempts per request, including the first one
+RETRY_BASE_DELAY = 2  # Backoff ceiling in seconds before the first retry, doubled on every retry
+RETRY_MAX_DELAY = 300  # Longest backoff between two attempts
+REQUEST_TIMEOUT = (10, 120)  # Seconds to connect and to wait for a response before retrying as transient
+RETRY_ON = ('transient', 'rate_limited')  # Error classes that are retried; auth and permanent errors stop the run
+JOURNAL_FILE = './upload.journal'  # Append-only log of uploaded frames, used to resume without --start
+JOURNAL_FSYNC_EVERY = 10  # Journal records written between two fsync calls
+DAEMON_INTERVAL = 1200  # Seconds between two posts in daemon mode
+CATCH_UP = 'skip'  # After a stall: 'skip' missed slots or 'burst' them out back to back
+MAX_CATCH_UP = 3  # Most missed slots posted back to back in 'burst' mode
+PREFETCH_DEPTH = 4  # Frames read ahead of the one being uploaded
+PREFETCH_MAX_BYTES = 64 * 1024 * 1024  # Memory cap for prefetched frames
+STREAM_UPLOADS = True  # Stream each frame's multipart body from disk instead of building it in memory
+SCHEDULE_MIN_LEAD = 10 * 60  # Graph API only schedules posts at least 10 minutes ahead
+SCHEDULE_MAX_LEAD = 30 * 24 * 60 * 60  # ... and at most 30 days ahead
+METRICS_PORT = None  # Serve Prometheus metrics on this local port, e.g. 9464
+METRICS_FILE = None  # ... or write them to this file for node_exporter's textfile collector
+METRICS_INTERVAL = 15  # Seconds between two writes of METRICS_FILE
+LOG_LEVEL = 'DEBUG'  # Per-frame events are logged at DEBUG
+LOG_FORMAT = 'text'  # 'text' (colored on a terminal) or 'json' lines
+TRACE_FILE = None  # Write per-frame spans as Chrome trace JSON here, e.g. './trace.json'
+PROFILE_OUTPUT = './profile'  # Path prefix of the files written by --profile
+PROFILE_INTERVAL = 0.005  # Seconds between two stack samples with --profile sample
+FRAME_DIR = './frame'  # Frames written by frame.py and read by main.py, with their manifest
+FRAME_RATE = 1  # Frames extracted per second of video by frame.py and --video
+FRAME_PACK = None  # Upload frames from this pack (frame.py --pack) instead of FRAME_DIR
@@ -1,31 +1,652 @@
 import os
+import math
+import time
+import queue
+import struct
+import bisect
+from array import array
+import argparse
+import logging
+import threading
 import subprocess
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def create_frames_from_video(video_path: str, output_folder: str, frame_rate: int = 1) -> None:
+import profiling
+from config import FRAME_DIR, FRAME_RATE, PROFILE_OUTPUT, PROFILE_INTERVAL
+from prefetch import JPEG_START, InvalidFrame
+from framepack import PackWriter, FramePack, INDEX_SUFFIX as PACK_INDEX_SUFFIX
+# manifest.py, with sqlite3 and hashlib, is imported by the functions that write a manifest
+
+# Completion markers in the output folder, one "<fps> <first> <last> <video>" line per extracted range
+EXTRACTED_MARKERS = '.extracted'
+FRAME_FILE = re.compile(r'frame_(\d+)\.jpg')
+
+# Sidecar next to each video caching its packet timestamps and keyframes
+INDEX_SUFFIX = '.keyframes'
+# Magic, version, video size, video mtime (ns), duration, packet count, keyframe count
+INDEX_HEADER = struct.Struct('<4sHQqdII')
+INDEX_MAGIC = b'LKFI'
+INDEX_VERSION = 1
+
+class VideoIndex:
+    """
+    Packet timestamps and keyframe positions of a video's first video stream, from one
+    ffprobe pass and cached in a sidecar file so later runs don't probe again.
+
+    The sidecar is a fixed header followed by every packet timestamp in milliseconds, as
+    signed 32-bit integers, and the packet number of every keyframe, as unsigned ones. It is rebuilt when the
+    video's size or mtime no longer match the ones recorded in the header.
+
+    :param duration: Length of the video stream in seconds.
+    :param packets: Packet presentation times in milliseconds, in presentation order.
+    :param keyframes: Numbers of the packets that are keyframes, ascending.
+    """
+
+    def __init__(self, duration: float, packets: array, keyframes: array):
+        self.duration = duration
+        self.packets = packets
+        self.keyframes = keyframes
+        self._keyframe_times = [packets[packet] / 1000 for packet in keyframes]
+
+    @classmethod
+    def probe(cls, video_path: str) -> 'VideoIndex':
+        command = [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,duration_time,flags',
+            '-of', 'csv=print_section=0',
+            video_path
+        ]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        entries = []
+        for line in output.splitlines():
+            pts, duration, flags = (line.split(',') + ['', ''])[:3]
+            if pts and pts != 'N/A':
+                entries.append((float(pts), float(duration) if duration not in ('', 'N/A') else 0.0, 'K' in flags))
+        # Packets come in decode order; B-frames make that differ from presentation order
+        entries.sort()
+        # Signed, streams that start with a negative timestamp (edit lists, B-frame delay) are common
+        packets = array('i', (round(pts * 1000) for pts, _, _ in entries))
+        keyframes = array('I', (number for number, (_, _, key) in enumerate(entries) if key))
+        duration = max((pts + length for pts, length, _ in entries), default=0.0)
+        return cls(duration, packets, keyframes)
+
+    @classmethod
+    def load(cls, video_path: str, rebuild: bool = False) -> 'VideoIndex':
+        """
+        Read the index from its sidecar, probing the video and writing a new sidecar when
+        there is none, it is out of date, or `rebuild` is set.
+        """
+        stat = os.stat(video_path)
+        index_path = video_path + INDEX_SUFFIX
+        if not rebuild:
+            try:
+                with open(index_path, 'rb') as index_file:
+                    data = index_file.read()
+                magic, version, size, mtime, duration, packet_count, keyframe_count = \
+                    INDEX_HEADER.unpack_from(data)
+                if (magic, version, size, mtime) == (INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns):
+                    packets = array('i')
+                    packets.frombytes(data[INDEX_HEADER.size:INDEX_HEADER.size + packet_count * packets.itemsize])
+                    keyframes = array('I')
+                    keyframes.frombytes(data[INDEX_HEADER.size + packet_count * packets.itemsize:])
+                    if len(packets) == packet_count and len(keyframes) == keyframe_count:
+                        return cls(duration, packets, keyframes)
+            except (OSError, struct.error):
+                pass
+
+        index = cls.probe(video_path)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as index_file:
+            index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns,
+                                               index.duration, len(index.packets), len(index.keyframes)))
+            index_file.write(index.packets.tobytes())
+            index_file.write(index.keyframes.tobytes())
+        os.replace(tmp_path, index_path)
+        return index
+
+    def frame_count(self, frame_rate: int) -> int:
+        return math.ceil(self.duration * frame_rate)
+
+    def keyframe_boundary(self, frame: int, frame_rate: int) -> int:
+        """
+        :return: First frame sampled at or after the keyframe closest to `frame`, so a range
+            starting there decodes nothing it throws away.
+        """
+        seconds = (frame - 1) / frame_rate
+        position = bisect.bisect_left(self._keyframe_times, seconds)
+        candidates = self._keyframe_times[max(0, position - 1):position + 1] or [seconds]
+        closest = min(candidates, key=lambda keyframe: abs(keyframe - seconds))
+        return math.ceil(closest * frame_rate - 1e-6) + 1
+
+def segment_ranges(frame_count: int, segments: int) -> list:
+    """
+    Split frames 1 to `frame_count` into contiguous ranges of near-equal length.
+
+    :return: (first frame, frame count) of every non-empty range, in order.
+    """
+    bounds = [round(i * frame_count / segments) for i in range(segments + 1)]
+    return [(bounds[i] + 1, bounds[i + 1] - bounds[i]) for i in range(segments) if bounds[i + 1] > bounds[i]]
+
+def ffmpeg_input(video_path: str, frame_rate: int, first: int = 1, count: int = None) -> list:
+    """
+    ffmpeg command, up to its output, producing `count` frames (all remaining ones when None)
+    from frame number `first` on.
+
+    Frame n is sampled at (n - 1) / frame_rate seconds. Seeking is done on the input side,
+    so ffmpeg jumps to the keyframe before the range instead of decoding everything before it,
+    and the fps filter then lines its output up with the same grid as a full extraction.
+    """
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error']
+    if first > 1:
+        command += ['-ss', f'{(first - 1) / frame_rate:.6f}']
+    command += ['-i', video_path, '-vf', f'fps={frame_rate}']
+    if count is not None:
+        command += ['-frames:v', str(count)]
+    return command
+
+def extract_command(video_path: str, output_folder: str, frame_rate: int, first: int = 1, count: int = None) -> list:
+    """
+    ffmpeg command writing frames numbered from `first` as frame_%04d.jpg files.
+    """
+    return ffmpeg_input(video_path, frame_rate, first, count) + [
+        '-start_number', str(first), os.path.join(output_folder, 'frame_%04d.jpg')
+    ]
+
+def create_frames_from_video(video_path: str, output_folder: str, frame_rate: int = FRAME_RATE,
+                             segments: int = 1, first: int = 1, count: int = None, resume: bool = True) -> None:
     """
     Extract frames from a video file and save them as JPEG images.
 
     :param video_path: Path to the input video file.
     :param output_folder: Directory where the frames will be saved.
     :param frame_rate: Number of frames to extract per second.
+    :param segments: Split the video into this many time ranges extracted by concurrent
+        ffmpeg processes; frame numbers stay continuous across ranges.
+    :param first: Number of the first frame to extract. ffmpeg seeks straight to its
+        timestamp, (first - 1) / frame_rate, instead of decoding everything before it.
+    :param count: Frames to extract, or None for every frame up to the end of the video.
+    :param resume: Only extract the frames not recorded as extracted from this video by an
+        earlier run. Without it everything is overwritten.
+
+    Every frame written is recorded in the folder's manifest (see manifest.py), which the
+    uploader reads instead of looking for files.
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    command = [
-        'ffmpeg',
-        '-i', video_path,
-        '-vf', f'fps={frame_rate}',
-        os.path.join(output_folder, 'frame_%04d.jpg')
-    ]
-    
+    if resume:
+        extract_missing_frames(video_path, output_folder, frame_rate, segments, first, count)
+        return
+
+    if segments > 1:
+        create_frames_in_segments(video_path, output_folder, frame_rate, segments, first, count)
+        return
+
+    if first > 1 or count is not None:
+        command = extract_command(video_path, output_folder, frame_rate, first, count)
+    else:
+        command = [
+            'ffmpeg',
+            '-i', video_path,
+            '-vf', f'fps={frame_rate}',
+            os.path.join(output_folder, 'frame_%04d.jpg')
+        ]
+
     try:
         subprocess.run(command, check=True)
+        record_folder(output_folder, frame_rate, first, count)
         print(f"Frames extracted successfully to {output_folder}")
     except subprocess.CalledProcessError as e:
         print(f"An error occurred while extracting frames: {e}")
 
+def plan_segments(index: VideoIndex, frame_rate: int, first: int, count: int, segments: int) -> list:
+    """
+    Split frames `first` to `first + count - 1` into up to `segments` ranges whose
+    boundaries are moved to the nearest keyframe from the video's index, so no ffmpeg
+    process decodes packets only to throw them away before its first frame.
+
+    :return: (first frame, frame count) of every range, in order.
+    """
+    if segments <= 1 or index is None:
+        return [(first, count)]
+    bounds = [first + offset - 1 for offset, _ in segment_ranges(count, segments)] + [first + count]
+    bounds = bounds[:1] + [index.keyframe_boundary(bound, frame_rate) for bound in bounds[1:-1]] + bounds[-1:]
+    bounds = sorted(set(bound for bound in bounds if first <= bound <= first + count))
+    return [(start, end - start) for start, end in zip(bounds, bounds[1:])]
+
+def run_extractions(video_path: str, output_folder: str, frame_rate: int, ranges: list, last: int = None,
+                    on_done=None, segments: int = None) -> None:
+    """
+    Extract every (first frame, frame count) range with its own ffmpeg process, at most
+    `segments` of them at a time (all at once when None). The range ending at `last` runs
+    to the end of the video, so rounding in the duration can't drop frames.
+    `on_done(first, count)` is called as each range completes.
+    """
+    def extract(start, length):
+        open_end = last is not None and start + length - 1 == last
+        subprocess.run(extract_command(video_path, output_folder, frame_rate, start, None if open_end else length),
+                       check=True)
+        return start, length
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(ranges), segments or len(ranges)))) as executor:
+        futures = [executor.submit(extract, start, length) for start, length in ranges]
+        for future in as_completed(futures):
+            start, length = future.result()
+            if on_done:
+                on_done(start, length)
+
+def create_frames_in_segments(video_path: str, output_folder: str, frame_rate: int, segments: int, first: int = 1,
+                              count: int = None) -> None:
+    """
+    Extract frames `first` to `first + count - 1`, or to the end of the video, with one
+    ffmpeg process per keyframe-aligned time range, all running at once.
+    """
+    try:
+        index = VideoIndex.load(video_path)
+        last = index.frame_count(frame_rate) if count is None else None
+        if count is None:
+            count = last - first + 1
+        ranges = plan_segments(index, frame_rate, first, count, segments)
+        run_extractions(video_path, output_folder, frame_rate, ranges, last, segments=segments)
+        record_folder(output_folder, frame_rate, first, None if last else count)
+        print(f"Frames extracted successfully to {output_folder} in {len(ranges)} segments")
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        print(f"An error occurred while extracting frames: {e}")
+
+# Identifies a video in completion markers, so markers of a replaced file don't count
+def video_key(video_path: str) -> str:
+    stat = os.stat(video_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{os.path.basename(video_path)}"
+
+def extracted_frames(output_folder: str, key: str, frame_rate: int) -> set:
+    """
+    Frames recorded in the folder's completion markers as extracted from this video.
+    They count as done even once the uploader has removed their files.
+    """
+    done = set()
+    try:
+        with open(os.path.join(output_folder, EXTRACTED_MARKERS)) as markers:
+            lines = markers.read().splitlines()
+    except FileNotFoundError:
+        return done
+    for line in lines:
+        fields = line.split(' ', 3)
+        if len(fields) == 4 and fields[3] == key and fields[0] == str(frame_rate) and \
+                fields[1].isdigit() and fields[2].isdigit():
+            done.update(range(int(fields[1]), int(fields[2]) + 1))
+    return done
+
+def mark_extracted(output_folder: str, key: str, frame_rate: int, first: int, count: int) -> None:
+    with open(os.path.join(output_folder, EXTRACTED_MARKERS), 'a') as markers:
+        markers.write(f"{frame_rate} {first} {first + count - 1} {key}\n")
+        markers.flush()
+        os.fsync(markers.fileno())
+
+def frame_files(output_folder: str, first: int = 1, last: int = None) -> dict:
+    """
+    :return: {frame: path} of the frame_%04d.jpg files in the folder from `first` to `last`.
+    """
+    files = {}
+    for name in os.listdir(output_folder):
+        match = FRAME_FILE.fullmatch(name)
+        if match and first <= int(match[1]) and (last is None or int(match[1]) <= last):
+            files[int(match[1])] = os.path.join(output_folder, name)
+    return files
+
+def record_folder(output_folder: str, frame_rate: int, first: int = 1, count: int = None) -> None:
+    """
+    Record every frame file from `first` on (`count` of them, or all) in the folder's manifest.
+    """
+    from manifest import Manifest, default_path as manifest_path
+    with Manifest(manifest_path(output_folder)) as manifest:
+        for frame, path in frame_files(output_folder, first, None if count is None else first + count - 1).items():
+            manifest.record_file(frame, path, (frame - 1) / frame_rate)
+
+def missing_ranges(first: int, last: int, done: set) -> list:
+    """
+    :return: (first frame, frame count) of every run of frames from `first` to `last` not in `done`.
+    """
+    ranges = []
+    for frame in range(first, last + 1):
+        if frame in done:
+            continue
+        if ranges and ranges[-1][0] + ranges[-1][1] == frame:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((frame, 1))
+    return ranges
+
+def extract_missing_frames(video_path: str, output_folder: str, frame_rate: int = FRAME_RATE, segments: int = 1,
+                           first: int = 1, count: int = None) -> None:
+    """
+    Extract only the frames a previous, possibly killed, run didn't.
+
+    A frame is done when a completion marker of this video covers it. Other frame files in
+    the folder, left by another video or torn by a killed ffmpeg, are extracted again. Each
+    missing run of frames is extracted by seeking straight to it, with at most `segments`
+    ffmpeg processes running at a time. A run is marked complete, and added to the
+    manifest, as soon as its process exits cleanly.
+    """
+    from manifest import Manifest, default_path as manifest_path
+    try:
+        key = video_key(video_path)
+        index = VideoIndex.load(video_path) if count is None or segments > 1 else None
+        last = index.frame_count(frame_rate) if count is None else first + count - 1
+        manifest = Manifest(manifest_path(output_folder))
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        print(f"An error occurred while extracting frames: {e}")
+        return
+
+    def range_done(start, length):
+        files = frame_files(output_folder, start, start + length - 1 if start + length - 1 < last else None)
+        for frame, path in files.items():
+            manifest.record_file(frame, path, (frame - 1) / frame_rate)
+        manifest.commit()
+        mark_extracted(output_folder, key, frame_rate, start, length)
+
+    try:
+        done = extracted_frames(output_folder, key, frame_rate)
+        recorded = set(manifest.frames())
+        for frame, path in frame_files(output_folder, first, last).items():
+            # Frames extracted before the folder had a manifest
+            if frame in done and frame not in recorded:
+                manifest.record_file(frame, path, (frame - 1) / frame_rate)
+        manifest.commit()
+
+        missing = missing_ranges(first, last, done)
+        if not missing:
+            print(f"Frames {first:04}-{last:04} are already extracted to {output_folder}")
+            return
+        total = sum(length for _, length in missing)
+        ranges = []
+        for start, length in missing:
+            ranges += plan_segments(index, frame_rate, start, length, max(1, round(segments * length / total)))
+
+        run_extractions(video_path, output_folder, frame_rate, ranges, last if count is None else None, range_done,
+                        segments)
+        print(f"{total} missing frames extracted successfully to {output_folder} in {len(ranges)} ranges")
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        print(f"An error occurred while extracting frames: {e}")
+    finally:
+        manifest.close()
+
+class JpegStreamParser:
+    """
+    Splits concatenated JPEG images, as written by ffmpeg's image2pipe muxer, into single
+    images. Marker segments are skipped by their length and entropy-coded data is scanned
+    for the next real marker (0xFF not followed by a stuffed 0x00 or a restart marker), so
+    bytes that merely look like an end-of-image marker never split an image.
+    Parsing resumes where the previous chunk left off, each byte is looked at once.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0  # Next unparsed byte of the image at the start of the buffer
+        self._scanning = False  # Inside entropy-coded data, after a start-of-scan header
+
+    @property
+    def pending(self) -> int:
+        """Bytes of an image that has not been completed yet."""
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> list:
+        """
+        :return: Every image completed by `data`, in order.
+        """
+        self._buffer += data
+        images = []
+        while True:
+            end = self._image_end()
+            if end is None:
+                return images
+            images.append(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+            self._pos = 0
+            self._scanning = False
+
+    def _image_end(self):
+        buffer = self._buffer
+        if self._pos == 0:
+            if len(buffer) < 2:
+                return None
+            if buffer[:2] != JPEG_START:
+                raise ValueError("JPEG stream is out of sync, expected a start-of-image marker")
+            self._pos = 2
+
+        while True:
+            pos = self._pos
+            if self._scanning:
+                while True:
+                    pos = buffer.find(b'\xff', pos)
+                    if pos < 0:
+                        self._pos = len(buffer)
+                        return None
+                    if pos + 1 >= len(buffer):
+                        self._pos = pos
+                        return None
+                    following = buffer[pos + 1]
+                    if following != 0x00 and not 0xd0 <= following <= 0xd7:
+                        break
+                    pos += 2
+                self._scanning = False
+                self._pos = pos
+
+            if pos + 2 > len(buffer):
+                return None
+            if buffer[pos] != 0xff:
+                raise ValueError(f"JPEG stream is out of sync, expected a marker at byte {pos}")
+            marker = buffer[pos + 1]
+            if marker == 0xd9:
+                return pos + 2
+            if marker == 0xff:
+                # Fill byte before a marker
+                self._pos = pos + 1
+                continue
+            if marker == 0x01 or 0xd0 <= marker <= 0xd7:
+                self._pos = pos + 2
+                continue
+            if pos + 4 > len(buffer):
+                return None
+            end = pos + 2 + (buffer[pos + 2] << 8 | buffer[pos + 3])
+            if end > len(buffer):
+                return None
+            self._pos = end
+            self._scanning = marker == 0xda
+
+class FrameStream:
+    """
+    Runs ffmpeg with an image2pipe output and yields (num, data) for every JPEG it writes,
+    numbered from `first`, without anything touching the disk.
+
+    A reader thread splits the pipe into images and hands them over through a queue of
+    `depth` frames. Once the queue is full the reader stops draining the pipe, the pipe
+    buffer fills up and ffmpeg blocks on its next write, so decoding pauses whenever the
+    uploads fall behind. A broken or truncated stream is raised as InvalidFrame when its
+    frame is reached.
+
+    :param video_path: Path to the input video file.
+    :param frame_rate: Number of frames to extract per second.
+    :param first: Number of the first frame, as in the frame_%04d.jpg files.
+    :param count: Frames to produce, or None to run to the end of the video.
+    :param depth: Frames decoded ahead of the consumer.
+    """
+
+    def __init__(self, video_path, frame_rate=FRAME_RATE, first=1, count=None, depth=4, chunk_size=64 * 1024):
+        self.first = first
+        self.chunk_size = chunk_size
+        self.frames = 0
+        self.read_bytes = 0
+        self.wait_time = 0.0  # Time the consumer spent blocked waiting for ffmpeg
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._done = False
+        self._closed = False
+        command = ffmpeg_input(video_path, frame_rate, first, count) + ['-f', 'image2pipe', '-c:v', 'mjpeg', '-']
+        self._process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+        self._thread = threading.Thread(target=self._read, name='frame-stream', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._closed:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self):
+        parser = JpegStreamParser()
+        num = self.first
+        try:
+            while True:
+                chunk = self._process.stdout.read1(self.chunk_size)
+                if not chunk:
+                    break
+                self.read_bytes += len(chunk)
+                for image in parser.feed(chunk):
+                    if not self._put((f"{num:04}", image, None)):
+                        return
+                    num += 1
+            returncode = self._process.wait()
+            if parser.pending:
+                raise InvalidFrame(f"{num:04}", f"Frame {num:04} was cut off after {parser.pending} bytes")
+            if returncode and not self._closed:
+                raise InvalidFrame(f"{num:04}", f"ffmpeg exited with status {returncode} before frame {num:04}")
+        except InvalidFrame as e:
+            self._put((e.num, None, e))
+        except (OSError, ValueError) as e:
+            self._put((f"{num:04}", None, InvalidFrame(f"{num:04}", str(e))))
+        self._put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        started = time.perf_counter()
+        item = self._queue.get()
+        self.wait_time += time.perf_counter() - started
+        if item is None:
+            self._done = True
+            raise StopIteration
+        num, data, error = item
+        if error is not None:
+            self._done = True
+            raise error
+        self.frames += 1
+        return num, data
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def summary(self):
+        return (f"Streamed {self.frames} frames ({self.read_bytes / 1024 / 1024:.1f} MB) from ffmpeg, "
+                f"upload loop waited {self.wait_time:.2f}s for frames")
+
+    def close(self):
+        self._closed = True
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._thread.join()
+        self._process.stdout.close()
+
+def create_frame_pack(video_path: str, pack_path: str, frame_rate: int = FRAME_RATE, first: int = 1,
+                      count: int = None, resume: bool = True) -> None:
+    """
+    Extract frames into a single pack file (see framepack.py) instead of one JPEG per frame.
+    ffmpeg's image2pipe output is appended to the pack as it is decoded, nothing else
+    is written to disk.
+
+    :param video_path: Path to the input video file.
+    :param pack_path: Data file of the pack, its index is written next to it.
+    :param frame_rate: Number of frames to extract per second.
+    :param first: Number of the first frame to extract.
+    :param count: Frames to extract, or None for every frame up to the end of the video.
+    :param resume: Skip frames already in the pack. A frame's index record is only written
+        after its data, so the pack's index is its own completion marker. Frames in the pack
+        but not in its manifest, written after the manifest's last commit, are added to it.
+    """
+    from manifest import Manifest, default_path as manifest_path
+    directory = os.path.dirname(pack_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    written = 0
+    try:
+        if resume and os.path.exists(pack_path + PACK_INDEX_SUFFIX):
+            with FramePack(pack_path) as pack, Manifest(manifest_path(None, pack_path)) as manifest:
+                done = set(pack.frames())
+                # Frames a killed run appended after the manifest's last commit
+                for frame in sorted(done - set(manifest.frames())):
+                    manifest.record(frame, pack.get(frame), (frame - 1) / frame_rate,
+                                    pack_offset=pack.location(frame)[0])
+            last = VideoIndex.load(video_path).frame_count(frame_rate) if count is None else first + count - 1
+            ranges = missing_ranges(first, last, done)
+            if ranges and count is None and ranges[-1][0] + ranges[-1][1] - 1 == last:
+                ranges[-1] = (ranges[-1][0], None)
+        else:
+            ranges = [(first, count)]
+
+        with PackWriter(pack_path) as pack, Manifest(manifest_path(None, pack_path)) as manifest:
+            for start, length in ranges:
+                frames = FrameStream(video_path, frame_rate, start, length)
+                try:
+                    for num, data in frames:
+                        offset = pack.append(int(num), data)
+                        manifest.record(int(num), data, (int(num) - 1) / frame_rate, pack_offset=offset)
+                        written += 1
+                        if written % 100 == 0:
+                            manifest.commit()
+                finally:
+                    frames.close()
+        print(f"{written} frames extracted successfully to {pack_path}")
+    except (subprocess.CalledProcessError, InvalidFrame, OSError, ValueError) as e:
+        print(f"An error occurred while extracting frames after {written} frames: {e}")
+
+# Argument parser setup
+def setup_argument_parser():
+    parser = argparse.ArgumentParser(description='Extract frames from a video with ffmpeg')
+    parser.add_argument('video_path', nargs='?', help='Video file (asked for when left out)')
+    parser.add_argument('--output', metavar=FRAME_DIR, default=FRAME_DIR,
+                        help='Directory the frames are written to, where main.py reads them')
+    parser.add_argument('--fps', metavar='1', default=FRAME_RATE, type=int, help='Frames extracted per second of video')
+    parser.add_argument('--pack', metavar='frames.pack',
+                        help='Append the frames to this pack file instead of writing one JPEG each to --output')
+    parser.add_argument('--start', metavar='123', default=1, type=int, help='First frame to extract')
+    parser.add_argument('--loop', metavar='40', type=int,
+                        help='Frames to extract from --start on (default: up to the end of the video)')
+    parser.add_argument('--segments', metavar='N', default=1, type=int,
+                        help='Extract N time ranges with concurrent ffmpeg processes (0: one per CPU core)')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='Extract every frame again instead of only the ones missing from earlier runs')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help=f'Probe the video again and rewrite its {INDEX_SUFFIX} index before extracting')
+    parser.add_argument('--profile', choices=profiling.MODES,
+                        help='Run under cProfile or the sampling profiler and write stats and collapsed stacks')
+    parser.add_argument('--profile-output', metavar='PREFIX', default=PROFILE_OUTPUT,
+                        help='Path prefix of the profile files (.prof/.collapsed and .txt)')
+    args = parser.parse_args()
+    if args.segments == 0:
+        args.segments = os.cpu_count() or 1
+    return args
+
 # Example usage
-video_path = input("Enter the path to the video file: ")
-output_folder = './frames'
-create_frames_from_video(video_path, output_folder, frame_rate=1)
+if __name__ == "__main__":
+    args = setup_argument_parser()
+    logging.basicConfig(level=logging.INFO)
+    video_path = args.video_path or input("Enter the path to the video file: ")
+    if args.rebuild_index:
+        index = VideoIndex.load(video_path, rebuild=True)
+        print(f"Indexed {len(index.packets)} packets and {len(index.keyframes)} keyframes over {index.duration:.1f}s")
+    with profiling.profile(args.profile, args.profile_output, PROFILE_INTERVAL):
+        if args.pack:
+            create_frame_pack(video_path, args.pack, frame_rate=args.fps, first=args.start, count=args.loop,
+                              resume=args.resume)
+        else:
+            create_frames_from_video(video_path, args.output, frame_rate=args.fps, segments=args.segments,
+                                     first=args.start, count=args.loop, resume=args.resume)
@@ -0,0 +1,124 @@
+import mmap
+import os
+import struct
+
+# One index record per frame: frame number, offset in the data file, length
+RECORD = struct.Struct('<IQI')
+INDEX_SUFFIX = '.idx'
+
+
+class PackWriter:
+    """
+    Appends frames to a pack: one data file holding the JPEGs back to back, plus a
+    fixed-width index of (frame, offset, length) records in `path` + '.idx'.
+
+    A frame's data is written before its index record, so a crash leaves at most some
+    unreferenced bytes at the end of the data file, which are cut off on the next open,
+    and a torn index record, which is dropped. Writing a frame again makes the new copy
+    the one readers see.
+
+    :param path: Data file of the pack, created when missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = open(path + INDEX_SUFFIX, 'a+b')
+        size = self._index.seek(0, os.SEEK_END)
+        size -= size % RECORD.size
+        self._index.truncate(size)
+        end = 0
+        if size:
+            self._index.seek(size - RECORD.size)
+            _, offset, length = RECORD.unpack(self._index.read(RECORD.size))
+            end = offset + length
+        self._data = open(path, 'a+b')
+        self._data.truncate(end)
+        self.offset = end
+
+    def append(self, frame, data):
+        """
+        :return: Offset of the frame in the data file.
+        """
+        offset = self.offset
+        self._data.write(data)
+        self._data.flush()
+        self._index.write(RECORD.pack(frame, offset, len(data)))
+        self._index.flush()
+        self.offset += len(data)
+        return offset
+
+    def close(self):
+        for pack_file in (self._data, self._index):
+            if not pack_file.closed:
+                os.fsync(pack_file.fileno())
+                pack_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FramePack:
+    """
+    Read-only view of a pack. The data file is memory-mapped and get() returns a
+    memoryview slice of it, so a frame goes to the upload without being copied or its
+    own file being opened, stat'ed or unlinked.
+
+    :param path: Data file of the pack.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._frames = {}
+        with open(path + INDEX_SUFFIX, 'rb') as index_file:
+            index = index_file.read()
+        for frame, offset, length in RECORD.iter_unpack(index[:len(index) - len(index) % RECORD.size]):
+            self._frames[frame] = (offset, length)
+
+        with open(path, 'rb') as data_file:
+            size = os.fstat(data_file.fileno()).st_size
+            self._mmap = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mmap) if self._mmap is not None else memoryview(b'')
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, frame):
+        return frame in self._frames
+
+    def frames(self):
+        """
+        :return: Every frame number in the pack, ascending.
+        """
+        return sorted(self._frames)
+
+    def location(self, frame):
+        """
+        :return: (offset, length) of the frame in the data file.
+        """
+        return self._frames[frame]
+
+    def get(self, frame):
+        """
+        :return: The frame's JPEG bytes as a memoryview into the mapped data file.
+        :raises KeyError: When the frame is not in the pack.
+        """
+        offset, length = self._frames[frame]
+        return self._view[offset:offset + length]
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Frames handed out are still referenced; the mapping goes away with them
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
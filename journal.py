@@ -0,0 +1,84 @@
+import os
+
+# Bytes read from the end of the journal to find the last record; records are tiny
+TAIL_SIZE = 4096
+
+
+class Journal:
+    """
+    Append-only record of every frame's upload result.
+
+    Each line is "<frame> <status> <post id> <next frame>", where the last field is
+    the first frame that has not been published yet. Resuming only needs the last
+    complete line, so startup reads a fixed-size tail however long the journal grows.
+
+    :param path: Journal file, created on first write.
+    :param fsync_every: Records written between two fsync calls.
+    """
+
+    def __init__(self, path, fsync_every=10):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._file = None
+        self._unsynced = 0
+
+    def last_record(self):
+        """
+        Read the last complete record without scanning the whole file.
+
+        :return: (frame, status, post_id, next_frame), or None for an empty journal.
+        """
+        try:
+            with open(self.path, 'rb') as journal_file:
+                size = journal_file.seek(0, os.SEEK_END)
+                journal_file.seek(max(0, size - TAIL_SIZE))
+                tail = journal_file.read()
+        except FileNotFoundError:
+            return None
+
+        # A crash can leave a torn last line behind; only newline-terminated lines count
+        for line in reversed(tail.split(b'\n')[1 if size > TAIL_SIZE else 0:-1]):
+            fields = line.decode('utf-8', 'replace').split(' ')
+            if len(fields) == 4 and fields[0].isdigit() and fields[3].isdigit():
+                return int(fields[0]), fields[1], fields[2], int(fields[3])
+        return None
+
+    def resume_point(self):
+        """
+        :return: The first unfinished frame, or None when nothing has been journaled.
+        """
+        record = self.last_record()
+        return record[3] if record else None
+
+    def record(self, frame, status, post_id, next_frame):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(f"{frame} {status} {post_id or '-'} {next_frame}\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    # The frame is done ('published' or 'scheduled'), the next run starts after it
+    def completed(self, frame, status, post_id):
+        self.record(frame, status, post_id, frame + 1)
+
+    def failed(self, frame):
+        self.record(frame, 'failed', None, frame)
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,86 @@
+import json
+import logging
+import sys
+
+
+# Color class for terminal output
+class Color:
+    PURPLE = '\033[95m'
+    CYAN = '\033[96m'
+    DARKCYAN = '\033[36m'
+    BLUE = '\033[94m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+    RESET = '\033[0m'
+    MAGENTA = "\033[35m"
+
+
+# Color of each frame event when logging to a terminal
+EVENT_COLORS = {
+    'uploaded': Color.GREEN,
+    'scheduled': Color.CYAN,
+    'staged': Color.CYAN,
+    'failed': Color.RED,
+}
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+
+
+class ColorFormatter(logging.Formatter):
+    """
+    Highlights frame events (logged with extra={'event': ...}) in bold and their event color.
+    Only used when the log stream is a terminal.
+    """
+
+    def formatMessage(self, record):
+        message = super().formatMessage(record)
+        color = EVENT_COLORS.get(getattr(record, 'event', None))
+        if color:
+            return f"{Color.BOLD}{color}{message}{Color.RESET}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message and every `extra` field.
+    The message and fields are only rendered when a record is actually emitted.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level=logging.DEBUG, log_format='text', stream=None):
+    """
+    Configure the root logger.
+
+    :param level: Lowest level emitted.
+    :param log_format: 'text' (colored on a terminal) or 'json' (JSON lines).
+    :param stream: Stream to log to, stderr by default.
+    """
+    stream = stream or sys.stderr
+    handler = logging.StreamHandler(stream)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    elif stream.isatty():
+        handler.setFormatter(ColorFormatter(logging.BASIC_FORMAT))
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
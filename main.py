@@ -1,69 +1,631 @@
 #!/usr/bin/env python3
-import requests
-import urllib3
+# Only what argument parsing and the upload loops need is imported up front. requests,
+# urllib3 and the HTTP plumbing in uploader.py, as well as sqlite3 for the frame manifest,
+# are imported once the arguments are valid, so --help and rejected command lines don't
+# pay for them; ffmpeg's helpers in frame.py are imported only when --video is given.
 import signal
 import sys
 import os
 import logging
 import argparse
 import time
-from config import ACCESS_TOKEN, CAPTION_TEMPLATE
+import json
+from datetime import datetime
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import (CAPTION_TEMPLATE, GRAPH_API_URL, POOL_SIZE, KEEP_ALIVE, STAGING_FILE, BATCH_SIZE,
+                    RATE_LIMIT, RATE_LIMIT_MIN, RATE_LIMIT_MAX, RATE_LIMIT_STEP, RATE_LIMIT_BURST, TARGET_USAGE,
+                    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_ON, REQUEST_TIMEOUT,
+                    JOURNAL_FILE, JOURNAL_FSYNC_EVERY, DAEMON_INTERVAL, CATCH_UP, MAX_CATCH_UP,
+                    PREFETCH_DEPTH, PREFETCH_MAX_BYTES, STREAM_UPLOADS,
+                    SCHEDULE_MIN_LEAD, SCHEDULE_MAX_LEAD, METRICS_PORT, METRICS_FILE, METRICS_INTERVAL,
+                    LOG_LEVEL, LOG_FORMAT, TRACE_FILE,
+                    PROFILE_OUTPUT, PROFILE_INTERVAL, FRAME_RATE,
+                    FRAME_PACK, FRAME_DIR)
+from ratelimit import TokenBucket
+from retry import RetryPolicy
+from journal import Journal
+from prefetch import Prefetcher, InvalidFrame
+import metrics
+import tracing
+import profiling
+from logformat import Color, setup_logging
 
-# Disable warnings and handle SIGINT
-urllib3.disable_warnings()
-signal.signal(signal.SIGINT, lambda x, y: sys.exit(1))
+# Unix timestamp or ISO 8601 date ('2024-11-02T18:00', local time unless an offset is given)
+def timestamp(value):
+    if value.isdigit():
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a Unix timestamp or ISO 8601 date: {value}")
+
+# Connect and read timeouts in seconds, 'CONNECT,READ' or one value for both
+def timeout(value):
+    try:
+        seconds = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        seconds = ()
+    if len(seconds) not in (1, 2) or min(seconds) <= 0:
+        raise argparse.ArgumentTypeError(f"not one or two positive numbers of seconds: {value}")
+    return seconds if len(seconds) == 2 else seconds[0]
 
 # Argument parser setup
 def setup_argument_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--start', metavar='123', type=int, required=True, help='First frame you want to upload')
-    parser.add_argument('--loop', metavar='40', nargs='?', default=40, type=int, help='Loop value')
-    return parser.parse_args()
-
-# Color class for terminal output
-class Color:
-    PURPLE = '\033[95m'
-    CYAN = '\033[96m'
-    DARKCYAN = '\033[36m'
-    BLUE = '\033[94m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    RED = '\033[91m'
-    BOLD = '\033[1m'
-    UNDERLINE = '\033[4m'
-    RESET = '\033[0m'
-    MAGENTA = "\033[35m"
-
-# Main function to upload frames
-def upload_frames(start_frame, loop_count):
-    url = "https://graph.facebook.com/v21.0/me/photos"
-
-    for i in range(start_frame, start_frame + loop_count):
-        time.sleep(3)
-        num = f"{i:04}"
-        image_source = f"./frame/frame_{num}.jpg"
-        caption = CAPTION_TEMPLATE.format(num=num)
-
-        payload = {
-            'access_token': ACCESS_TOKEN,
-            'caption': caption,
-            'published': 'true',
-        }
-
-        with open(image_source, 'rb') as image_file:
-            files = {'source': (image_source, image_file)}
-            response = requests.post(url, files=files, data=payload)
-
-        if response.status_code == 200:
-            logging.debug(f"{Color.BOLD}{Color.GREEN}Frame {num} Uploaded{Color.RESET}. {response.json()}")
-            os.remove(image_source)
+    parser.add_argument('--start', metavar='123', type=int,
+                        help='First frame you want to upload (default: resume from the journal)')
+    parser.add_argument('--loop', metavar='40', nargs='?', type=int,
+                        help='Loop value (default: 40, or until frames run out with --daemon)')
+    parser.add_argument('--base-url', metavar='URL', default=GRAPH_API_URL,
+                        help='Graph API root, e.g. a local mock_graph.py server for offline benchmarks')
+    parser.add_argument('--pool-size', metavar='4', default=POOL_SIZE, type=int, help='Connections kept in the session pool')
+    parser.add_argument('--no-keep-alive', dest='keep_alive', action='store_false', default=KEEP_ALIVE,
+                        help='Close the connection after every request')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', default=STREAM_UPLOADS,
+                        help='Let requests build each multipart body in memory instead of streaming it')
+    parser.add_argument('--concurrency', metavar='N', default=1, type=int,
+                        help='Stage N frames at once and publish them in frame order, several per batch '
+                             'request; helps when latency, not --max-rate, is the bottleneck')
+    parser.add_argument('--two-phase', action='store_true',
+                        help='Stage the whole range as unpublished photos first, then publish them in order')
+    parser.add_argument('--staging-file', metavar='staged.json', default=STAGING_FILE,
+                        help='Where --two-phase keeps the photo IDs of staged frames')
+    parser.add_argument('--batch', metavar='N', type=int,
+                        help=f'Send up to N frames per Graph API batch request (max {BATCH_SIZE})')
+    parser.add_argument('--rate', metavar='0.33', default=RATE_LIMIT, type=float,
+                        help='Initial requests per second, adjusted from the API usage headers')
+    parser.add_argument('--max-rate', metavar='2', default=RATE_LIMIT_MAX, type=float,
+                        help='Requests per second the limiter never exceeds')
+    parser.add_argument('--target-usage', metavar='80', default=TARGET_USAGE, type=float,
+                        help='Quota usage percentage the limiter stays under')
+    parser.add_argument('--retries', metavar='5', default=RETRY_MAX_ATTEMPTS, type=int,
+                        help='Attempts per request before giving up on a transient or rate-limit error')
+    parser.add_argument('--retry-delay', metavar='2', default=RETRY_BASE_DELAY, type=float,
+                        help='Backoff in seconds before the first retry, doubled on every retry')
+    parser.add_argument('--timeout', metavar='10,120', default=REQUEST_TIMEOUT, type=timeout,
+                        help='Seconds to connect and to wait for a response; a request timing out is retried '
+                             'as a transient error')
+    parser.add_argument('--prefetch', metavar='K', default=PREFETCH_DEPTH, type=int,
+                        help='Read and validate the next K frames while the current one uploads (0 to disable)')
+    parser.add_argument('--video', metavar='episode.mkv',
+                        help=f'Decode frames straight from this video with ffmpeg instead of reading {FRAME_DIR}')
+    parser.add_argument('--pack', metavar='frames.pack', default=FRAME_PACK,
+                        help=f'Read frames from this pack written by frame.py --pack instead of {FRAME_DIR}')
+    parser.add_argument('--manifest', metavar='manifest.sqlite',
+                        help='Frame manifest written by frame.py (default: the one in the frame folder, or next '
+                             'to --pack); frames are looked up there when it exists')
+    parser.add_argument('--fps', metavar='1', default=FRAME_RATE, type=int,
+                        help='Frames per second of video, as extracted by frame.py, for --video')
+    parser.add_argument('--metrics-port', metavar='9464', default=METRICS_PORT, type=int,
+                        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', metavar='lain.prom', default=METRICS_FILE,
+                        help="Write Prometheus metrics to this file for node_exporter's textfile collector")
+    parser.add_argument('--trace', metavar='trace.json', default=TRACE_FILE,
+                        help='Record per-frame spans and write them as Chrome trace JSON on exit')
+    parser.add_argument('--profile', choices=profiling.MODES,
+                        help='Run under cProfile or the sampling profiler and write stats and collapsed stacks')
+    parser.add_argument('--profile-output', metavar='PREFIX', default=PROFILE_OUTPUT,
+                        help='Path prefix of the profile files (.prof/.collapsed and .txt)')
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'),
+                        help='Lowest level logged; per-frame events are DEBUG')
+    parser.add_argument('--log-format', default=LOG_FORMAT, choices=('text', 'json'),
+                        help='Plain text (colored on a terminal) or one JSON object per line')
+    parser.add_argument('--journal', metavar='upload.journal', default=JOURNAL_FILE,
+                        help='Append-only log of uploaded frames used to resume runs')
+    parser.add_argument('--schedule', action='store_true',
+                        help='Upload the range now and let Graph API publish one frame every --interval seconds')
+    parser.add_argument('--schedule-start', metavar='2024-11-02T18:00', type=timestamp,
+                        help=f'Publish time of the first frame with --schedule (default: {SCHEDULE_MIN_LEAD // 60 + 5} minutes from now)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Stay resident and post one frame every --interval seconds')
+    parser.add_argument('--interval', metavar='1200', default=DAEMON_INTERVAL, type=float,
+                        help='Seconds between two posts in --daemon and --schedule modes')
+    parser.add_argument('--catch-up', choices=('skip', 'burst'), default=CATCH_UP,
+                        help='After a stall, skip the missed slots or post them back to back')
+    parser.add_argument('--max-catch-up', metavar='3', default=MAX_CATCH_UP, type=int,
+                        help='Most missed slots posted back to back with --catch-up burst')
+    args = parser.parse_args()
+    if args.loop is None and not args.daemon:
+        args.loop = 40
+    if args.interval <= 0:
+        parser.error("--interval must be a positive number of seconds")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.batch is not None and args.batch < 1:
+        parser.error("--batch must be at least 1")
+    if args.schedule_start is not None and args.schedule_start < time.time() + SCHEDULE_MIN_LEAD:
+        parser.error(f"--schedule-start must be at least {SCHEDULE_MIN_LEAD // 60} minutes in the future")
+    if args.manifest and not os.path.exists(args.manifest):
+        parser.error(f"--manifest {args.manifest} does not exist, run frame.py to write it")
+    if args.video and args.pack:
+        parser.error("--video and --pack are two different frame sources, pick one")
+    if (args.video or args.pack) and (args.schedule or args.daemon or args.two_phase or args.batch or
+                                      args.concurrency > 1):
+        parser.error("--video and --pack only work with the sequential upload loop")
+    if args.start is None:
+        args.start = Journal(args.journal).resume_point()
+        if args.start is None:
+            parser.error(f"--start is required when {args.journal} has no uploaded frames to resume from")
+    return args
+
+# Where a frame is when there's no manifest to look it up in
+def frame_source(num):
+    return os.path.join(FRAME_DIR, f"frame_{num}.jpg")
+
+# {frame: FrameEntry} of a run's frames in `manifest`, empty without one
+def run_entries(manifest, start_frame, loop_count):
+    return manifest.entries(start_frame, loop_count) if manifest else {}
+
+# Where a frame is: its path in `entries`, or frame_source() when it isn't there
+def frame_path(num, entries):
+    entry = entries.get(int(num))
+    return entry.path if entry and entry.path else frame_source(num)
+
+# A frame's bytes, read from its file unless `data` is given, checked against the size and
+# SHA-256 in its manifest entry. Without an entry nothing is read and `data` is returned as is.
+def checked_frame(num, entries, data=None):
+    entry = entries.get(int(num))
+    if entry is None:
+        return data
+    if data is None:
+        try:
+            with open(frame_path(num, entries), 'rb') as image_file:
+                data = image_file.read()
+        except OSError as e:
+            raise InvalidFrame(num, str(e))
+    if not entry.matches(data):
+        raise InvalidFrame(num, f"Frame {num} does not match its size and SHA-256 in the manifest")
+    return data
+
+# Log a frame that made it to the page, remove its file and journal its post ID. A removed
+# file is dropped from `manifest` too, so preflight doesn't count it as still there.
+# `started` is the time.monotonic() at which work on the frame began.
+def frame_published(num, body, journal=None, started=None, status='published', remove=True, path=None,
+                    manifest=None):
+    event = 'uploaded' if status == 'published' else status
+    logging.debug("Frame %s %s. %s", num, event.capitalize(), body, extra={'event': event, 'frame': num})
+    if remove:
+        with tracing.span('remove'):
+            os.remove(path or frame_path(num, run_entries(manifest, int(num), 1)))
+            if manifest:
+                manifest.forget(int(num))
+    if journal:
+        journal.completed(int(num), status, body.get('post_id') or body.get('id'))
+    metrics.FRAMES.inc(status=status)
+    metrics.LAST_FRAME.set(int(num))
+    metrics.LAST_FRAME_TIMESTAMP.set(time.time())
+    if started is not None:
+        metrics.FRAME_SECONDS.observe(time.monotonic() - started)
+
+# Log and journal a frame that didn't make it; `action` is what was being attempted
+def frame_failed(num, journal=None, action='Upload', result=None, reason=None):
+    if result is not None:
+        logging.debug("Failed to %s Frame %s (%s). %s", action, num, result.error_class, result.body,
+                      extra={'event': 'failed', 'frame': num, 'error_class': result.error_class})
+    else:
+        logging.debug("Failed to %s Frame %s. %s", action, num, reason,
+                      extra={'event': 'failed', 'frame': num})
+    if journal:
+        journal.failed(int(num))
+    metrics.FRAMES.inc(status='failed')
+
+# Main function to upload frames. With `prefetch` set, the next frames are read and
+# validated on a background thread while the current request is in flight. With `video`
+# set, frames are decoded by ffmpeg and piped straight into the uploads instead, with
+# up to `prefetch` of them decoded ahead. With `pack` set, they are sliced out of the
+# memory-mapped FramePack, which stays as it is once they are uploaded. Frame files are
+# looked up in `manifest` when there is one, and checked against the size and SHA-256
+# recorded there before they are uploaded.
+def upload_frames(start_frame, loop_count, uploader, journal=None, prefetch=0, prefetch_max_bytes=PREFETCH_MAX_BYTES,
+                  video=None, frame_rate=FRAME_RATE, pack=None, manifest=None):
+    nums = (f"{i:04}" for i in range(start_frame, start_frame + loop_count))
+    entries = run_entries(manifest, start_frame, loop_count)
+
+    if pack:
+        frames = pack_frames(pack, nums)
+    elif video:
+        from frame import FrameStream
+        frames = FrameStream(video, frame_rate, start_frame, loop_count, max(1, prefetch))
+    elif prefetch:
+        frames = Prefetcher(((num, frame_path(num, entries)) for num in nums), prefetch, prefetch_max_bytes)
+    else:
+        frames = ((num, None) for num in nums)
+    buffered = not pack and (video or prefetch)
+
+    uploaded = 0
+    try:
+        for num, data in frames:
+            started = time.monotonic()
+            if buffered:
+                metrics.QUEUE_DEPTH.set(frames.queued, stage='prefetch')
+            data = checked_frame(num, entries, data)
+            with tracing.span('frame', frame=num):
+                image_source = frame_path(num, entries)
+                caption = CAPTION_TEMPLATE.format(num=num)
+                result = uploader.upload_photo(image_source, caption, data=data)
+
+                if result.ok:
+                    frame_published(num, result.body, journal, started, remove=not (video or pack),
+                                    path=image_source, manifest=manifest)
+                    uploaded += 1
+                else:
+                    frame_failed(num, journal, result=result)
+            if not result.ok:
+                break
+    except InvalidFrame as e:
+        frame_failed(e.num, journal, action='Read', reason=e)
+    finally:
+        if buffered:
+            frames.close()
+            logging.info("%s", frames.summary())
+    return uploaded
+
+# (num, data) of every frame in `nums`, missing ones raise InvalidFrame like an unreadable file
+def pack_frames(pack, nums):
+    for num in nums:
+        if int(num) not in pack:
+            raise InvalidFrame(num, f"Frame {num} is not in {pack.path}")
+        yield num, pack.get(int(num))
+
+# Upload a frame as an unpublished photo; raises InvalidFrame when it doesn't match the manifest
+def stage_frame(uploader, num, entries):
+    return uploader.upload_photo(frame_path(num, entries), CAPTION_TEMPLATE.format(num=num), published=False,
+                                 data=checked_frame(num, entries))
+
+# Publish a staged frame and remove its file once it is on the page
+def publish_frame(uploader, num, photo_id, journal=None, started=None, manifest=None):
+    result = uploader.publish_photo(photo_id, CAPTION_TEMPLATE.format(num=num))
+    if result.ok:
+        frame_published(num, result.body, journal, started, manifest=manifest)
+        return True
+    frame_failed(num, journal, action='Publish', result=result)
+    return False
+
+# Publish staged (num, started, photo_id) frames in order with one chained batch request,
+# a single frame with a plain feed call
+def publish_frames(uploader, staged, journal=None, manifest=None):
+    if len(staged) == 1:
+        num, started, photo_id = staged[0]
+        return publish_frame(uploader, num, photo_id, journal, started, manifest)
+
+    result = uploader.publish_batch([(photo_id, CAPTION_TEMPLATE.format(num=num)) for num, _, photo_id in staged])
+    if not result.ok:
+        frame_failed(staged[0][0], journal, action='Publish Batch at', result=result)
+        return False
+    for (num, started, _), (status_code, body) in zip(staged, parse_batch_response(result, len(staged))):
+        if status_code == 200:
+            frame_published(num, body, journal, started, manifest=manifest)
         else:
-            logging.debug(f"{Color.BOLD}{Color.RED}Failed to Upload Frame {num}{Color.RESET}. {response.json()}")
+            frame_failed(num, journal, action='Publish', reason=body)
+            return False
+    return True
+
+# Upload frames on a thread pool as unpublished photos and publish them in frame order.
+# Up to `concurrency` uploads run ahead of the frames being published. Every frame staged
+# by the time the first unpublished one is, is published along with it in one batch
+# request while the pool keeps staging, so publish round trips are shared by up to
+# `concurrency` frames instead of being paid once per frame. Each frame still costs a
+# staging request plus its share of a publish, so when the rate limiter rather than
+# latency is the bottleneck this mode is slightly slower than the sequential one.
+def upload_frames_concurrent(start_frame, loop_count, uploader, concurrency, journal=None, manifest=None):
+    frames = iter(range(start_frame, start_frame + loop_count))
+    entries = run_entries(manifest, start_frame, loop_count)
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        def fill():
+            while len(in_flight) < concurrency:
+                i = next(frames, None)
+                if i is None:
+                    return
+                num = f"{i:04}"
+                in_flight.append((num, time.monotonic(), executor.submit(stage_frame, uploader, num, entries)))
+
+        fill()
+        while in_flight:
+            ready = [in_flight.popleft()]
+            wait([ready[0][2]])
+            while in_flight and len(ready) < BATCH_SIZE and in_flight[0][2].done():
+                ready.append(in_flight.popleft())
+            fill()
+            metrics.QUEUE_DEPTH.set(len(in_flight), stage='upload')
+
+            staged = []
+            failed = False
+            for num, started, future in ready:
+                try:
+                    result = future.result()
+                except InvalidFrame as e:
+                    frame_failed(num, journal, action='Read', reason=e)
+                    failed = True
+                    break
+                if not result.ok:
+                    frame_failed(num, journal, result=result)
+                    failed = True
+                    break
+                staged.append((num, started, result.body['id']))
+            if (staged and not publish_frames(uploader, staged, journal, manifest)) or failed:
+                break
+
+        for num, started, future in in_flight:
+            future.cancel()
+        if in_flight:
+            logging.debug("Stopped before publishing frames %s-%s", in_flight[0][0], in_flight[-1][0])
+
+# Split a batch response into one (status_code, body) pair per operation.
+# Operations that never ran (a dependency failed) come back as null.
+def parse_batch_response(batch_result, count):
+    parsed = []
+    for result in batch_result.body[:count]:
+        if result is None:
+            parsed.append((None, None))
+            continue
+        try:
+            body = json.loads(result.get('body') or 'null')
+        except ValueError:
+            body = result.get('body')
+        parsed.append((result.get('code'), body))
+    parsed.extend((None, None) for _ in range(count - len(parsed)))
+    return parsed
+
+# Upload frames in Graph API batch requests of up to `batch_size` frames each
+def upload_frames_batched(start_frame, loop_count, uploader, batch_size=BATCH_SIZE, journal=None, manifest=None):
+    batch_size = min(batch_size, BATCH_SIZE)
+    nums = [f"{i:04}" for i in range(start_frame, start_frame + loop_count)]
+    entries = run_entries(manifest, start_frame, loop_count)
+
+    for offset in range(0, len(nums), batch_size):
+        started = time.monotonic()
+        frames = []
+        invalid = None
+        # Frames before one that doesn't match the manifest still go out in this batch
+        for num in nums[offset:offset + batch_size]:
+            try:
+                frames.append((frame_path(num, entries), CAPTION_TEMPLATE.format(num=num), checked_frame(num, entries)))
+            except InvalidFrame as e:
+                invalid = e
+                break
+        chunk = nums[offset:offset + len(frames)]
+
+        if frames:
+            result = uploader.upload_batch(frames)
+            if not result.ok:
+                frame_failed(chunk[0], journal, action='Upload Batch at', result=result)
+                return
+
+            for num, (status_code, body) in zip(chunk, parse_batch_response(result, len(chunk))):
+                if status_code == 200:
+                    frame_published(num, body, journal, started, path=frame_path(num, entries), manifest=manifest)
+                else:
+                    frame_failed(num, journal, reason=body)
+                    return
+        if invalid is not None:
+            frame_failed(invalid.num, journal, action='Read', reason=invalid)
+            return
+
+def load_staged(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as staged_file:
+        return json.load(staged_file)
+
+def save_staged(path, staged):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as staged_file:
+        json.dump(staged, staged_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+# Two-phase upload: stage every frame in parallel as an unpublished photo, saving the
+# returned photo IDs, then publish the IDs in frame order with small feed calls.
+# Frames already in the staging file are not uploaded again, so a failed publish
+# phase can be re-run without transferring any bytes.
+def upload_frames_two_phase(start_frame, loop_count, uploader, concurrency, staging_file=STAGING_FILE,
+                            journal=None, manifest=None):
+    nums = [f"{i:04}" for i in range(start_frame, start_frame + loop_count)]
+    staged = load_staged(staging_file)
+    entries = run_entries(manifest, start_frame, loop_count)
+    started = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        for num in nums:
+            if num not in staged:
+                started[num] = time.monotonic()
+                futures[num] = executor.submit(stage_frame, uploader, num, entries)
+        for num, future in futures.items():
+            try:
+                result = future.result()
+            except InvalidFrame as e:
+                logging.debug("Failed to Read Frame %s. %s", num, e, extra={'event': 'failed', 'frame': num})
+                continue
+            if result.ok:
+                staged[num] = result.body['id']
+                logging.debug("Frame %s Staged. %s", num, result.body, extra={'event': 'staged', 'frame': num})
+            else:
+                logging.debug("Failed to Stage Frame %s (%s). %s", num, result.error_class, result.body,
+                              extra={'event': 'failed', 'frame': num, 'error_class': result.error_class})
+    save_staged(staging_file, staged)
+
+    for num in nums:
+        if num not in staged:
+            logging.debug("Frame %s was not staged, stopping publish", num)
+            break
+        if not publish_frame(uploader, num, staged[num], journal, started.get(num), manifest):
             break
+        del staged[num]
+        save_staged(staging_file, staged)
+
+# Scheduled mode: upload the whole range in one burst as unpublished photos with increasing
+# scheduled_publish_time values, so Graph API publishes them on schedule with no local process
+# left running. Frame k goes out at publish_start + (k - start_frame) * interval. Uploads run on
+# the thread pool since order on the page comes from the publish times, but results are
+# journaled in frame order. Frames that would fall past SCHEDULE_MAX_LEAD are left for a later run.
+def schedule_frames(start_frame, loop_count, uploader, concurrency=1, publish_start=None, interval=DAEMON_INTERVAL,
+                    journal=None, manifest=None):
+    now = time.time()
+    if publish_start is None:
+        publish_start = int(now) + SCHEDULE_MIN_LEAD + 300
+    if publish_start < now + SCHEDULE_MIN_LEAD:
+        raise ValueError(f"Scheduled posts must be at least {SCHEDULE_MIN_LEAD // 60} minutes in the future")
+
+    in_window = int((now + SCHEDULE_MAX_LEAD - publish_start) // interval) + 1
+    if in_window < loop_count:
+        logging.info("Only %d of %d frames fit in the scheduling window, schedule the rest in a later run",
+                     max(0, in_window), loop_count)
+        loop_count = max(0, in_window)
+
+    entries = run_entries(manifest, start_frame, loop_count)
+
+    def schedule(num, publish_time):
+        return uploader.schedule_photo(frame_path(num, entries), CAPTION_TEMPLATE.format(num=num), publish_time,
+                                       data=checked_frame(num, entries))
+
+    scheduled = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = []
+        for offset in range(loop_count):
+            num = f"{start_frame + offset:04}"
+            publish_time = int(publish_start + offset * interval)
+            futures.append((num, publish_time, time.monotonic(), executor.submit(schedule, num, publish_time)))
+
+        failed = None
+        for num, publish_time, started, future in futures:
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except InvalidFrame as e:
+                result = None
+                invalid = e
+            if failed is not None:
+                # Already in flight when an earlier frame failed; it is on the schedule but
+                # not journaled, so it has to be removed by hand before re-running
+                if result is not None and result.ok:
+                    logging.info("Frame %s was scheduled for %s after frame %s failed. %s", num,
+                                 datetime.fromtimestamp(publish_time).isoformat(' '), failed, result.body)
+                continue
+            if result is not None and result.ok:
+                logging.debug("Frame %s goes out at %s", num, datetime.fromtimestamp(publish_time).isoformat(' '))
+                frame_published(num, result.body, journal, started, status='scheduled',
+                                path=frame_path(num, entries), manifest=manifest)
+                scheduled += 1
+            else:
+                if result is None:
+                    frame_failed(num, journal, action='Read', reason=invalid)
+                else:
+                    frame_failed(num, journal, action='Schedule', result=result)
+                failed = num
+                for _, _, _, pending in futures:
+                    pending.cancel()
+    return scheduled
+
+# Daemon mode: post one frame every `interval` seconds, scheduled against the monotonic
+# clock so the slots never drift. Slot k is due at origin + k * interval, whatever time
+# the previous post took. After a stall the missed slots are either skipped ('skip') or
+# posted back to back, at most `max_catch_up` of them ('burst'). A failed frame is
+# retried in the next slot.
+def run_daemon(start_frame, uploader, journal, interval=DAEMON_INTERVAL, catch_up=CATCH_UP,
+               max_catch_up=MAX_CATCH_UP, loop_count=None, manifest=None):
+    next_frame = start_frame
+    posted = 0
+    origin = time.monotonic()
+    slot = 0
+
+    while loop_count is None or posted < loop_count:
+        num = f"{next_frame:04}"
+        if manifest:
+            available = next_frame in manifest.entries(next_frame, 1)
+        else:
+            available = os.path.exists(frame_source(num))
+        if not available:
+            logging.info("No frame %s to post, stopping daemon", num)
+            return
+
+        due = origin + slot * interval
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        behind = int((time.monotonic() - due) // interval)
+        if behind:
+            skipped = behind if catch_up == 'skip' else max(0, behind - max_catch_up)
+            logging.info("Daemon is %d slot(s) behind, skipping %d and catching up on %d", behind, skipped,
+                         behind - skipped)
+            slot += skipped
+
+        if upload_frames(next_frame, 1, uploader, journal, manifest=manifest):
+            next_frame += 1
+            posted += 1
+        # Posts are minutes apart, so sync every record rather than in batches
+        journal.sync()
+        slot += 1
 
 # Entry point of the script
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.DEBUG)
     args = setup_argument_parser()
-    upload_frames(args.start, args.loop)
-    print(f"{Color.BOLD}Task Done{Color.RESET}")
+    from uploader import Uploader, RETRY_EXCEPTIONS
+    from framepack import FramePack
+    from manifest import Manifest, default_path as manifest_path
+
+    # Handle SIGINT, plus SIGTERM so a daemon stops with its journal synced
+    signal.signal(signal.SIGINT, lambda x, y: sys.exit(1))
+    signal.signal(signal.SIGTERM, lambda x, y: sys.exit(0))
+    setup_logging(args.log_level, args.log_format)
+    if args.trace:
+        tracing.TRACER.enable()
+    limiter = TokenBucket(args.rate, RATE_LIMIT_BURST, min(RATE_LIMIT_MIN, args.rate), args.max_rate,
+                          RATE_LIMIT_STEP, args.target_usage)
+    retry = RetryPolicy(args.retries, args.retry_delay, RETRY_MAX_DELAY, RETRY_ON, RETRY_EXCEPTIONS)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    textfile = metrics.TextfileWriter(args.metrics_file, METRICS_INTERVAL) if args.metrics_file else None
+
+    manifest_file = args.manifest or manifest_path(FRAME_DIR, args.pack)
+    manifest = Manifest(manifest_file) if not args.video and os.path.exists(manifest_file) else None
+    if manifest and args.loop:
+        # Every frame of the run is checked with one query before anything is uploaded
+        problems = manifest.preflight(args.start, args.loop)
+        for problem in problems:
+            logging.error("%s", problem)
+        if problems:
+            sys.exit(1)
+
+    logging.info("Starting at frame %04d", args.start)
+    try:
+        with profiling.profile(args.profile, args.profile_output, PROFILE_INTERVAL), \
+                Uploader(base_url=args.base_url, pool_size=max(args.pool_size, args.concurrency + 1),
+                         keep_alive=args.keep_alive, limiter=limiter, retry=retry, stream=args.stream,
+                         timeout=args.timeout) as uploader, \
+                Journal(args.journal, JOURNAL_FSYNC_EVERY) as journal:
+            if args.schedule:
+                schedule_frames(args.start, args.loop, uploader, args.concurrency, args.schedule_start, args.interval,
+                                journal, manifest)
+            elif args.daemon:
+                run_daemon(args.start, uploader, journal, args.interval, args.catch_up, args.max_catch_up, args.loop,
+                           manifest)
+            elif args.two_phase:
+                upload_frames_two_phase(args.start, args.loop, uploader, args.concurrency, args.staging_file, journal,
+                                        manifest)
+            elif args.batch:
+                upload_frames_batched(args.start, args.loop, uploader, args.batch, journal, manifest)
+            elif args.concurrency > 1:
+                upload_frames_concurrent(args.start, args.loop, uploader, args.concurrency, journal, manifest)
+            else:
+                with ExitStack() as stack:
+                    pack = stack.enter_context(FramePack(args.pack)) if args.pack else None
+                    upload_frames(args.start, args.loop, uploader, journal, args.prefetch, video=args.video,
+                                  frame_rate=args.fps, pack=pack, manifest=manifest)
+            logging.info("%s", uploader.stats.summary())
+            logging.info("Rate limiter: %s", uploader.limiter)
+            logging.info("Retries by error class: %s", uploader.retry.retries)
+    finally:
+        if manifest:
+            manifest.close()
+        if textfile:
+            textfile.stop()
+        if args.trace:
+            tracing.TRACER.export(args.trace)
+            logging.info("Trace written to %s", args.trace)
+    print(f"{Color.BOLD}Task Done{Color.RESET}" if sys.stdout.isatty() else "Task Done")
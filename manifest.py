@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+
+MANIFEST_NAME = 'manifest.sqlite'
+PACK_MANIFEST_SUFFIX = '.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    frame INTEGER PRIMARY KEY,
+    path TEXT,
+    pack_offset INTEGER,
+    size INTEGER NOT NULL,
+    sha256 BLOB NOT NULL,
+    timestamp REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+class FrameEntry(namedtuple('FrameEntry', 'frame path pack_offset size sha256 timestamp')):
+    __slots__ = ()
+
+    def matches(self, data):
+        """
+        :return: Whether `data` is the frame recorded here, by size and SHA-256.
+        """
+        return len(data) == self.size and hashlib.sha256(data).digest() == self.sha256
+
+
+def default_path(folder, pack=None):
+    """
+    :return: Where the manifest of a frame folder, or of a pack when one is given, lives.
+    """
+    return pack + PACK_MANIFEST_SUFFIX if pack else os.path.join(folder, MANIFEST_NAME)
+
+
+class Manifest:
+    """
+    SQLite table of every extracted frame: its number, file path (relative to the
+    manifest) or offset in a pack, size, SHA-256 and timestamp in the source video.
+
+    Extraction writes it and the uploader reads it, so the uploader neither builds
+    paths nor stats files to know which frames exist: checking a whole run is one query.
+
+    :param path: Manifest file, created on first use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.folder = os.path.dirname(os.path.abspath(path))
+        self._db = sqlite3.connect(path)
+        self._db.execute(SCHEMA)
+
+    def record(self, frame, data, timestamp, path=None, pack_offset=None):
+        if path is not None:
+            path = os.path.relpath(os.path.abspath(path), self.folder)
+        self._db.execute('INSERT OR REPLACE INTO frames VALUES (?, ?, ?, ?, ?, ?)',
+                         (frame, path, pack_offset, len(data), hashlib.sha256(data).digest(), timestamp))
+
+    def record_file(self, frame, path, timestamp):
+        with open(path, 'rb') as image_file:
+            self.record(frame, image_file.read(), timestamp, path=path)
+
+    def commit(self):
+        self._db.commit()
+
+    def forget(self, frame):
+        """
+        Drop a frame whose file has been removed after its upload, so a later preflight of
+        the same range reports it instead of passing.
+        """
+        self._db.execute('DELETE FROM frames WHERE frame = ?', (frame,))
+        self._db.commit()
+
+    def frames(self):
+        """
+        :return: Every frame number in the manifest, ascending.
+        """
+        return [frame for frame, in self._db.execute('SELECT frame FROM frames ORDER BY frame')]
+
+    def entries(self, first, count):
+        """
+        :return: {frame: FrameEntry} of the frames from `first` to `first + count - 1` in the
+            manifest, with paths resolved against the manifest's folder.
+        """
+        rows = self._db.execute('SELECT * FROM frames WHERE frame BETWEEN ? AND ? ORDER BY frame',
+                                (first, first + count - 1))
+        entries = {}
+        for row in rows:
+            entry = FrameEntry(*row)
+            if entry.path is not None:
+                entry = entry._replace(path=os.path.join(self.folder, entry.path))
+            entries[entry.frame] = entry
+        return entries
+
+    def preflight(self, first, count):
+        """
+        Check a run's frames against the manifest alone, without touching the frames.
+
+        :return: A description of every problem found, empty when the run can go ahead.
+        """
+        entries = self.entries(first, count)
+        missing = [frame for frame in range(first, first + count) if frame not in entries]
+        problems = []
+        if missing:
+            shown = ', '.join(f"{frame:04}" for frame in missing[:10])
+            problems.append(f"{len(missing)} frames not in {self.path}, never extracted or already uploaded: "
+                            f"{shown}{', ...' if len(missing) > 10 else ''}")
+        empty = [f"{frame:04}" for frame, entry in entries.items() if not entry.size]
+        if empty:
+            problems.append(f"Empty frames: {', '.join(empty)}")
+        return problems
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,187 @@
+import os
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    pairs = ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", labels + (('le', format_value(bound)),), count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, counts[-1]))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        return self.register(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self.register(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self):
+        """
+        :return: Every metric in the Prometheus text exposition format.
+        """
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+FRAME_SECONDS = REGISTRY.histogram('lain_frame_upload_seconds',
+                                   'Time from starting a frame upload until it is on the page')
+REQUEST_SECONDS = REGISTRY.histogram('lain_request_seconds', 'Graph API request latency by endpoint')
+FRAMES = REGISTRY.counter('lain_frames_total', 'Frames processed by outcome')
+BYTES_SENT = REGISTRY.counter('lain_bytes_sent_total', 'Request body bytes sent to the Graph API')
+RETRIES = REGISTRY.counter('lain_retries_total', 'Retried requests by error class')
+THROTTLE_WAIT_SECONDS = REGISTRY.counter('lain_throttle_wait_seconds_total', 'Time spent waiting on the rate limiter')
+RATE_LIMIT = REGISTRY.gauge('lain_rate_limit_requests_per_second', 'Current rate limiter refill rate')
+API_USAGE = REGISTRY.gauge('lain_api_usage_percent', 'Highest quota usage reported by the usage headers')
+QUEUE_DEPTH = REGISTRY.gauge('lain_queue_depth', 'Frames waiting in a pipeline stage')
+LAST_FRAME = REGISTRY.gauge('lain_last_frame', 'Number of the last frame uploaded')
+LAST_FRAME_TIMESTAMP = REGISTRY.gauge('lain_last_frame_timestamp_seconds', 'Unix time the last frame was uploaded')
+
+
+def serve(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    Serve /metrics from a background thread.
+
+    :return: The running server; call shutdown() to stop it.
+    """
+    # Imported here, so runs that never serve metrics don't load http.server
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+def write_textfile(path, registry=REGISTRY):
+    """
+    Atomically write the metrics for node_exporter's textfile collector.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as metrics_file:
+        metrics_file.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class TextfileWriter:
+    """
+    Rewrites the textfile every `interval` seconds on a background thread, and once more on stop().
+    """
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-textfile', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            write_textfile(self.path, self.registry)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        write_textfile(self.path, self.registry)
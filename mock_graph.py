@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+import argparse
+import email.parser
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+
+def distribution(value):
+    """
+    Parse a latency distribution in seconds: 'fixed:0.2', 'uniform:0.1,0.5',
+    'normal:0.3,0.05' or 'lognormal:-1.5,0.4' (mu and sigma of the underlying normal).
+
+    :return: A callable returning one sample, never negative.
+    """
+    kind, _, params = value.partition(':')
+    try:
+        args = [float(param) for param in params.split(',')] if params else []
+        sampler = {
+            'fixed': lambda: args[0],
+            'uniform': lambda: random.uniform(args[0], args[1]),
+            'normal': lambda: random.gauss(args[0], args[1]),
+            'lognormal': lambda: random.lognormvariate(args[0], args[1]),
+        }[kind]
+        sampler()
+    except (KeyError, IndexError, ValueError):
+        raise argparse.ArgumentTypeError(f"bad latency distribution: {value}")
+    return lambda: max(0.0, sampler())
+
+
+class MockGraphConfig:
+    """
+    Behaviour of the mock endpoint.
+
+    :param latency: Callable returning the response delay in seconds.
+    :param error_rate: Share of requests answered with a transient 500 error.
+    :param throttle_rate: Share of requests answered with an application rate-limit error.
+    :param auth_error_rate: Share of requests answered with an expired access token error.
+    :param quota: Calls allowed per usage window before every request is throttled.
+    :param window: Length of the usage window in seconds.
+    """
+
+    def __init__(self, latency=None, error_rate=0.0, throttle_rate=0.0, quota=200, window=3600.0,
+                 auth_error_rate=0.0):
+        self.latency = latency or (lambda: 0.0)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.auth_error_rate = auth_error_rate
+        self.quota = quota
+        self.window = window
+
+
+class MockGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockGraph/1.0'
+    # Headers and body go out in separate writes; with Nagle on, the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self.reply(200, self.server.stats())
+        else:
+            self.reply(404, {'error': {'message': 'Unknown path', 'type': 'GraphMethodException', 'code': 100}})
+
+    def do_POST(self):
+        path = self.path.split('?')[0].strip('/').split('/')
+        endpoint = '/'.join(path[1:] if path and path[0].startswith('v') else path)
+        # Only batch requests need their body; uploads are read and discarded like a sink
+        size, body = self.read_body(keep=endpoint == '')
+        config = self.server.config
+        time.sleep(config.latency())
+        usage = self.server.record_call(size)
+
+        roll = random.random()
+        if usage > 100 or roll < config.throttle_rate:
+            self.server.count('throttled')
+            self.reply(400, {'error': {'message': '(#4) Application request limit reached',
+                                       'type': 'OAuthException', 'code': 4, 'is_transient': True}}, usage=100)
+            return
+        if roll < config.throttle_rate + config.error_rate:
+            self.server.count('errors')
+            self.reply(500, {'error': {'message': 'An unexpected error has occurred. Please retry your request later.',
+                                       'type': 'OAuthException', 'code': 2, 'is_transient': True}}, usage=usage)
+            return
+        if roll < config.throttle_rate + config.error_rate + config.auth_error_rate:
+            self.server.count('errors')
+            self.reply(400, {'error': {'message': 'Error validating access token: Session has expired.',
+                                       'type': 'OAuthException', 'code': 190, 'error_subcode': 463}}, usage=usage)
+            return
+
+        if endpoint in ('me/photos', 'me/feed'):
+            self.reply(200, self.server.new_object(endpoint), usage=usage)
+        elif endpoint == '':
+            self.reply(200, self.batch(body), usage=usage)
+        else:
+            self.reply(400, {'error': {'message': f"Unsupported post request: {endpoint}",
+                                       'type': 'GraphMethodException', 'code': 100}}, usage=usage)
+
+    def read_body(self, keep):
+        length = int(self.headers.get('Content-Length', 0))
+        size = 0
+        chunks = []
+        while size < length:
+            chunk = self.rfile.read(min(length - size, 64 * 1024))
+            if not chunk:
+                break
+            size += len(chunk)
+            if keep:
+                chunks.append(chunk)
+        return size, b''.join(chunks)
+
+    # Answer every operation of a batch request, honouring attached files and depends_on.
+    # Like Graph API, a named operation that succeeds is answered with null unless its
+    # omit_response_on_success is false.
+    def batch(self, body):
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode('latin-1')
+        message = email.parser.BytesParser().parsebytes(header + body)
+        parts = {}
+        if message.is_multipart():
+            for part in message.get_payload():
+                parts[part.get_param('name', header='content-disposition')] = part.get_payload(decode=True)
+        else:
+            # Batches without attached files are plain form posts
+            parts = {name: values[0].encode('utf-8') for name, values in parse_qs(body.decode('utf-8')).items()}
+
+        results = []
+        failed = set()
+        for operation in json.loads(parts.get('batch') or b'[]'):
+            attached = operation.get('attached_files')
+            if operation.get('depends_on') in failed or (attached and attached not in parts):
+                failed.add(operation.get('name'))
+                results.append(None)
+                continue
+            endpoint = operation.get('relative_url', '').split('?')[0].strip('/')
+            response = {'code': 200, 'body': json.dumps(self.server.new_object(endpoint))}
+            omitted = operation.get('name') and operation.get('omit_response_on_success', True) is not False
+            results.append(None if omitted else response)
+        return results
+
+    def reply(self, status, payload, usage=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if usage is not None:
+            usage = min(100, int(usage))
+            self.send_header('X-App-Usage', json.dumps({'call_count': usage, 'total_cputime': usage // 2,
+                                                        'total_time': usage // 2}))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockGraphServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Graph API endpoints the uploader talks to: me/photos,
+    me/feed and batch requests, with configurable latency, error and throttle
+    rates and X-App-Usage headers computed from a sliding window of calls.
+    GET /stats returns request, byte and error counters.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), MockGraphHandler)
+        self.config = config or MockGraphConfig()
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._ids = itertools.count(1)
+        self._counters = {'requests': 0, 'bytes_received': 0, 'throttled': 0, 'errors': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v21.0"
+
+    def record_call(self, size):
+        """
+        :return: Usage of the quota window in percent, including this call (above 100 once over quota).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['bytes_received'] += size
+            self._calls.append(now)
+            while self._calls and self._calls[0] < now - self.config.window:
+                self._calls.popleft()
+            return len(self._calls) * 100.0 / self.config.quota
+
+    def count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def new_object(self, endpoint):
+        object_id = str(next(self._ids))
+        if endpoint == 'me/feed':
+            return {'id': f"1000_{object_id}"}
+        return {'id': object_id, 'post_id': f"1000_{object_id}"}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='mock-graph', daemon=True).start()
+        return self
+
+
+def setup_argument_parser():
+    parser = argparse.ArgumentParser(description='Local mock of the Graph API photo endpoints')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', default=8080, type=int)
+    parser.add_argument('--latency', metavar='lognormal:-2,0.5', default=distribution('fixed:0'), type=distribution,
+                        help="Response delay distribution in seconds: fixed:S, uniform:A,B, normal:MU,SD, "
+                             "lognormal:MU,SIGMA")
+    parser.add_argument('--error-rate', metavar='0.01', default=0.0, type=float,
+                        help='Share of requests failing with a transient 500')
+    parser.add_argument('--throttle-rate', metavar='0.01', default=0.0, type=float,
+                        help='Share of requests failing with a rate-limit error')
+    parser.add_argument('--auth-error-rate', metavar='0.01', default=0.0, type=float,
+                        help='Share of requests failing with an expired access token error')
+    parser.add_argument('--quota', metavar='200', default=200, type=int,
+                        help='Calls per window before the usage headers reach 100%% and requests are throttled')
+    parser.add_argument('--window', metavar='3600', default=3600.0, type=float, help='Usage window in seconds')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = setup_argument_parser()
+    server = MockGraphServer(MockGraphConfig(args.latency, args.error_rate, args.throttle_rate, args.quota,
+                                             args.window, args.auth_error_rate), args.host, args.port)
+    print(f"Mock Graph API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
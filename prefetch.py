@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import deque
+
+import tracing
+
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+
+class InvalidFrame(ValueError):
+    def __init__(self, num, message):
+        super().__init__(message)
+        self.num = num
+
+
+def validate_jpeg(num, data):
+    if not data.startswith(JPEG_START) or not data.rstrip(b'\0').endswith(JPEG_END):
+        raise InvalidFrame(num, f"Frame {num} is not a complete JPEG ({len(data)} bytes)")
+
+
+class Prefetcher:
+    """
+    Reads and validates upcoming frames on a background thread while the current
+    one is being uploaded.
+
+    At most `depth` frames, and no more than `max_bytes` of them (one frame is always
+    allowed through however large), are held in memory at a time. Iterating yields
+    (num, data) in order; a frame that can't be read or isn't a complete JPEG is raised as
+    InvalidFrame when it is reached.
+
+    :param frames: Iterable of (num, path) pairs.
+    :param depth: Frames read ahead of the consumer.
+    :param max_bytes: Memory cap for frames waiting to be consumed.
+    """
+
+    def __init__(self, frames, depth=4, max_bytes=64 * 1024 * 1024):
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self.buffered_bytes = 0
+        self.read_bytes = 0
+        self.read_time = 0.0  # Time the reader thread spent opening and reading files
+        self.wait_time = 0.0  # Time the consumer spent blocked waiting for a frame
+        self._frames = iter(frames)
+        self._ready = deque()
+        self._done = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._read_ahead, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def _has_room(self, size):
+        return not self._ready or (len(self._ready) < self.depth and self.buffered_bytes + size <= self.max_bytes)
+
+    def _read_ahead(self):
+        for num, path in self._frames:
+            if self._closed:
+                break
+            started = time.perf_counter()
+            throttled = 0.0
+            try:
+                with open(path, 'rb') as image_file:
+                    size = os.fstat(image_file.fileno()).st_size
+                    with self._condition:
+                        throttle_started = time.perf_counter()
+                        while not self._closed and not self._has_room(size):
+                            self._condition.wait()
+                        throttled = time.perf_counter() - throttle_started
+                        if self._closed:
+                            break
+                    with tracing.span('read', frame=num):
+                        data = image_file.read()
+                validate_jpeg(num, data)
+                item = (num, data, None)
+            except OSError as e:
+                item = (num, None, InvalidFrame(num, str(e)))
+                data = b''
+            except InvalidFrame as e:
+                item = (num, None, e)
+                data = b''
+            elapsed = time.perf_counter() - started - throttled
+
+            with self._condition:
+                self.read_time += elapsed
+                self.read_bytes += len(data)
+                self.buffered_bytes += len(data)
+                self._ready.append(item)
+                self._condition.notify_all()
+                if item[2] is not None:
+                    break
+
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        with self._condition:
+            while not self._ready and not self._done:
+                self._condition.wait()
+            self.wait_time += time.perf_counter() - started
+            if not self._ready:
+                raise StopIteration
+            num, data, error = self._ready.popleft()
+            if data is not None:
+                self.buffered_bytes -= len(data)
+            self._condition.notify_all()
+        if error is not None:
+            raise error
+        return num, data
+
+    @property
+    def queued(self):
+        return len(self._ready)
+
+    @property
+    def saved_time(self):
+        """Read time hidden behind network I/O instead of stalling the upload loop."""
+        return max(0.0, self.read_time - self.wait_time)
+
+    def summary(self):
+        return (f"Prefetch read {self.read_bytes / 1024 / 1024:.1f} MB in {self.read_time:.2f}s, "
+                f"upload loop waited {self.wait_time:.2f}s, overlap saved {self.saved_time:.2f}s")
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
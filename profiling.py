@@ -0,0 +1,136 @@
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+MODES = ('cprofile', 'sample')
+
+
+def frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler: a background thread records the stack of every other
+    thread each `interval` seconds. Threads blocked on the network or a lock are sampled
+    too, so the result shows where wall time goes, not only CPU time, at a cost that does
+    not grow with the number of calls the way cProfile's does.
+
+    :param interval: Seconds between two samples.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """
+        :return: One "thread;outer;...;inner count" line per distinct stack, the input
+            format of flamegraph.pl, speedscope and inferno.
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self, limit=30):
+        """
+        :return: The functions seen most often, on top of the stack (self) and anywhere in it (total).
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms, {sum(self.stacks.values())} thread stacks",
+                 '', f"{'self':>8} {'total':>8}  function"]
+        for label, count in own.most_common(limit):
+            lines.append(f"{count:>8} {total[label]:>8}  {label}")
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def profile(mode, output, interval=0.005):
+    """
+    Profile the enclosed block and write its results next to `output` on exit.
+
+    'cprofile' writes output.prof (pstats, for snakeviz or pstats.Stats) and output.txt,
+    the report sorted by cumulative time; only the calling thread is profiled.
+    'sample' samples every thread and writes output.collapsed for flame graphs and
+    output.txt, the most sampled functions.
+
+    :param mode: 'cprofile', 'sample', or None to run the block unprofiled.
+    :param output: Path prefix of the files written.
+    :param interval: Seconds between two samples in 'sample' mode.
+    """
+    if mode is None:
+        yield
+        return
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+
+    if mode == 'cprofile':
+        # Imported here, pstats alone costs more than the rest of startup
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{output}.prof")
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(40)
+            with open(f"{output}.txt", 'w') as report_file:
+                report_file.write(report.getvalue())
+            logging.info("cProfile stats of %.2fs written to %s.prof and %s.txt", time.perf_counter() - started,
+                         output, output)
+    elif mode == 'sample':
+        sampler = SamplingProfiler(interval).start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with open(f"{output}.collapsed", 'w') as collapsed_file:
+                collapsed_file.write(sampler.collapsed())
+            with open(f"{output}.txt", 'w') as report_file:
+                report_file.write(sampler.report())
+            logging.info("%d samples over %.2fs written to %s.collapsed and %s.txt", sampler.samples,
+                         time.perf_counter() - started, output, output)
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}")
@@ -0,0 +1,115 @@
+import json
+import logging
+import threading
+import time
+
+# Graph API usage headers, each reporting percentages of the current quota window
+USAGE_HEADERS = ('X-App-Usage', 'X-Page-Usage', 'X-Ad-Account-Usage', 'X-Business-Use-Case-Usage')
+USAGE_FIELDS = ('call_count', 'total_cputime', 'total_time', 'acc_id_util_pct')
+
+
+def parse_usage(headers):
+    """
+    Read the Graph API rate-limit usage headers of a response.
+
+    :param headers: Response headers.
+    :return: (highest usage percentage across all headers, seconds until access is regained)
+    """
+    usage = 0.0
+    regain = 0.0
+    for name in USAGE_HEADERS:
+        value = headers.get(name)
+        if not value:
+            continue
+        try:
+            data = json.loads(value)
+        except ValueError:
+            continue
+
+        # X-Business-Use-Case-Usage nests one list of entries per business id
+        if name == 'X-Business-Use-Case-Usage':
+            entries = [entry for items in data.values() for entry in items]
+        else:
+            entries = [data]
+
+        for entry in entries:
+            usage = max([usage] + [float(entry.get(field) or 0) for field in USAGE_FIELDS])
+            regain = max(regain, float(entry.get('estimated_time_to_regain_access') or 0) * 60)
+    return usage, regain
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate follows the usage headers Graph API returns.
+
+    Below the target usage the rate grows additively, above it the rate is halved,
+    so the uploader settles just under quota instead of sleeping a fixed interval.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, max_rate=None, step=None, target_usage=80.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate if min_rate is not None else rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.step = step if step is not None else self.min_rate
+        self.target_usage = target_usage
+        self.usage = 0.0
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Block until a token is available.
+
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def update(self, headers, throttled=False):
+        """
+        Adjust the refill rate from a response's usage headers.
+
+        :param headers: Response headers.
+        :param throttled: Whether the response was a rate-limit error.
+        """
+        usage, regain = parse_usage(headers)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.usage = usage
+            if throttled or usage >= 100:
+                self.rate = self.min_rate
+                self.tokens = min(self.tokens, 0.0)
+            elif usage >= self.target_usage:
+                self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.step)
+            if regain:
+                self.paused_until = max(self.paused_until, time.monotonic() + regain)
+        logging.debug("Rate limiter: %s", self)
+
+    def __str__(self):
+        return self.state()
+
+    def state(self):
+        paused = max(0.0, self.paused_until - time.monotonic())
+        return (f"rate={self.rate:.3f}/s tokens={self.tokens:.2f}/{self.burst} usage={self.usage:.0f}%"
+                + (f" paused={paused:.0f}s" if paused else ""))
@@ -0,0 +1,128 @@
+import logging
+import random
+import threading
+import time
+
+import metrics
+
+# Error classes a Graph API response can fall into
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate_limited'
+AUTH = 'auth'
+PERMANENT = 'permanent'
+
+# https://developers.facebook.com/docs/graph-api/guides/error-handling
+TRANSIENT_CODES = {1, 2}
+RATE_LIMITED_CODES = {4, 17, 32, 341, 368, 613} | set(range(80001, 80015))
+AUTH_CODES = {10, 102, 190} | set(range(200, 300))
+
+
+class GraphResult:
+    """
+    A Graph API response whose body has been parsed exactly once.
+
+    :param status_code: HTTP status code, or None when the request never got a response.
+    :param body: Decoded JSON body (or the raw text when it isn't JSON).
+    :param headers: Response headers.
+    """
+
+    def __init__(self, status_code, body, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.error = body.get('error') if isinstance(body, dict) else None
+        self.error_class = classify(status_code, self.error)
+
+    @classmethod
+    def from_response(cls, response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        return cls(response.status_code, body, response.headers)
+
+    @property
+    def ok(self):
+        return self.status_code == 200 and self.error is None
+
+    def __repr__(self):
+        return f"<GraphResult {self.status_code} {self.error_class or 'ok'}>"
+
+
+def classify(status_code, error):
+    """
+    Sort a response into one of the error classes.
+
+    :param status_code: HTTP status code, or None for a connection failure.
+    :param error: The "error" object of the response body, if any.
+    :return: One of TRANSIENT, RATE_LIMITED, AUTH, PERMANENT, or None on success.
+    """
+    if status_code == 200 and error is None:
+        return None
+    if error:
+        code = error.get('code')
+        if code in RATE_LIMITED_CODES or error.get('error_subcode') in RATE_LIMITED_CODES:
+            return RATE_LIMITED
+        if code in AUTH_CODES:
+            return AUTH
+        if code in TRANSIENT_CODES or error.get('is_transient'):
+            return TRANSIENT
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code is None or status_code >= 500:
+        return TRANSIENT
+    if status_code in (401, 403):
+        return AUTH
+    return PERMANENT
+
+
+class RetryPolicy:
+    """
+    Retries requests that failed with a retryable error class, sleeping with
+    exponential backoff and full jitter between attempts.
+
+    :param max_attempts: Attempts per request, including the first one.
+    :param base_delay: Backoff ceiling in seconds for the first retry; doubles every retry.
+    :param max_delay: Upper bound of the backoff ceiling.
+    :param retry_on: Error classes worth retrying.
+    :param exceptions: Exceptions raised by the request that count as a transient failure.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=2.0, max_delay=300.0, retry_on=(TRANSIENT, RATE_LIMITED),
+                 exceptions=(ConnectionError, TimeoutError)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = set(retry_on)
+        self.exceptions = tuple(exceptions)
+        self.retries = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, send):
+        """
+        Run send() until it succeeds, fails permanently or runs out of attempts.
+
+        :param send: Callable performing the request and returning a GraphResult.
+        :return: The last GraphResult.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                result = send()
+            except self.exceptions as e:
+                result = GraphResult(None, {'error': {'message': str(e)}})
+
+            if result.ok or result.error_class not in self.retry_on or attempt + 1 == self.max_attempts:
+                return result
+
+            with self._lock:
+                self.retries[result.error_class] = self.retries.get(result.error_class, 0) + 1
+            metrics.RETRIES.inc(error_class=result.error_class)
+            delay = self.backoff(attempt)
+            logging.debug("Retrying after %s error in %.1fs (attempt %d/%d). %s", result.error_class, delay,
+                          attempt + 2, self.max_attempts, result.body,
+                          extra={'event': 'retry', 'error_class': result.error_class})
+            time.sleep(delay)
+        return result
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# The scripts live at the top of the repository and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_graph import MockGraphConfig, MockGraphServer
+from ratelimit import TokenBucket
+from retry import RetryPolicy
+
+JPEG = b'\xff\xd8' + b'\0' * 1024 + b'\xff\xd9'
+
+
+@pytest.fixture
+def graph():
+    server = MockGraphServer(MockGraphConfig()).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uploader(graph):
+    from uploader import Uploader, RETRY_EXCEPTIONS
+
+    limiter = TokenBucket(1000, burst=1000, max_rate=1000)
+    retry = RetryPolicy(3, base_delay=0.001, max_delay=0.01, exceptions=RETRY_EXCEPTIONS)
+    with Uploader(base_url=graph.url, limiter=limiter, retry=retry) as uploader:
+        yield uploader
+
+
+@pytest.fixture
+def frames(tmp_path, monkeypatch):
+    """
+    Frame files 1 to 5 in a temporary FRAME_DIR.
+    """
+    import main
+
+    for num in range(1, 6):
+        (tmp_path / f"frame_{num:04}.jpg").write_bytes(JPEG)
+    monkeypatch.setattr(main, 'FRAME_DIR', str(tmp_path))
+    return tmp_path
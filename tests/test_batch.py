@@ -0,0 +1,82 @@
+import json
+
+from journal import Journal
+from main import parse_batch_response, upload_frames_batched, upload_frames_concurrent
+from retry import GraphResult
+
+
+def test_upload_batch_answers_every_frame(graph, uploader, frames):
+    paths = [str(frames / f"frame_{num:04}.jpg") for num in range(1, 4)]
+    result = uploader.upload_batch([(path, f"Frame {index}", None) for index, path in enumerate(paths)])
+
+    assert result.ok
+    parsed = parse_batch_response(result, len(paths))
+    assert [code for code, _ in parsed] == [200, 200, 200]
+    assert all(body['post_id'] for _, body in parsed)
+    assert graph.stats()['requests'] == 1
+
+
+def test_named_operations_are_omitted_on_success_by_default(uploader):
+    batch = [{'method': 'POST', 'relative_url': 'me/feed', 'body': 'message=first', 'name': 'first'},
+             {'method': 'POST', 'relative_url': 'me/feed', 'body': 'message=second', 'depends_on': 'first'}]
+    result = uploader.post('', data={'batch': json.dumps(batch)})
+
+    assert parse_batch_response(result, 2)[0] == (None, None)
+    assert parse_batch_response(result, 2)[1][0] == 200
+
+
+def test_parse_batch_response():
+    result = GraphResult(200, [
+        {'code': 200, 'body': '{"id": "1", "post_id": "1000_1"}'},
+        {'code': 400, 'body': '{"error": {"message": "Invalid parameter", "code": 100}}'},
+        None,
+    ])
+
+    assert parse_batch_response(result, 4) == [
+        (200, {'id': '1', 'post_id': '1000_1'}),
+        (400, {'error': {'message': 'Invalid parameter', 'code': 100}}),
+        (None, None),
+        (None, None),
+    ]
+
+
+def test_parse_batch_response_keeps_bodies_that_are_not_json():
+    result = GraphResult(200, [{'code': 502, 'body': 'Bad Gateway'}])
+
+    assert parse_batch_response(result, 1) == [(502, 'Bad Gateway')]
+
+
+def test_upload_frames_batched_journals_every_frame(graph, uploader, frames, tmp_path):
+    journal_path = str(tmp_path / 'upload.journal')
+    with Journal(journal_path) as journal:
+        upload_frames_batched(1, 5, uploader, batch_size=2, journal=journal)
+
+    with open(journal_path) as journal_file:
+        records = [line.split() for line in journal_file]
+    assert [(record[0], record[1]) for record in records] == [(str(num), 'published') for num in range(1, 6)]
+    assert all(record[2] != '-' for record in records)
+    assert Journal(journal_path).resume_point() == 6
+    assert not list(frames.glob('frame_*.jpg'))
+    assert graph.stats()['requests'] == 3
+
+
+def test_publish_batch_posts_photos_in_order(graph, uploader):
+    result = uploader.publish_batch([(str(photo_id), f"Frame {photo_id}") for photo_id in range(1, 4)])
+
+    parsed = parse_batch_response(result, 3)
+    assert [code for code, _ in parsed] == [200, 200, 200]
+    assert [body['id'] for _, body in parsed] == ['1000_1', '1000_2', '1000_3']
+
+
+def test_upload_frames_concurrent_shares_publish_requests(graph, uploader, frames, tmp_path):
+    graph.config.latency = lambda: 0.02
+    journal_path = str(tmp_path / 'upload.journal')
+    with Journal(journal_path) as journal:
+        upload_frames_concurrent(1, 5, uploader, concurrency=4, journal=journal)
+
+    with open(journal_path) as journal_file:
+        records = [line.split() for line in journal_file]
+    assert [(record[0], record[1]) for record in records] == [(str(num), 'published') for num in range(1, 6)]
+    assert not list(frames.glob('frame_*.jpg'))
+    # Five staging requests, and fewer publish requests than frames
+    assert graph.stats()['requests'] < 10
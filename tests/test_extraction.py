@@ -0,0 +1,134 @@
+import threading
+import time
+from array import array
+
+import frame
+from frame import (VideoIndex, extract_missing_frames, extracted_frames, mark_extracted, missing_ranges,
+                   plan_segments, video_key, EXTRACTED_MARKERS)
+
+from conftest import JPEG
+
+
+class FakeFfmpeg:
+    """
+    Stands in for subprocess.run, writing the frames an extract_command() asks for with
+    the video's name in them, and records every (first, count) range extracted and the
+    most processes running at once.
+    """
+
+    def __init__(self, delay=0.0):
+        self.ranges = []
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, command, check=False):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        first = int(command[command.index('-start_number') + 1])
+        count = int(command[command.index('-frames:v') + 1])
+        video = command[command.index('-i') + 1]
+        for num in range(first, first + count):
+            with open(command[-1] % num, 'wb') as image_file:
+                image_file.write(JPEG[:2] + video.encode() + JPEG[2:])
+        with self.lock:
+            self.ranges.append((first, count))
+            self.running -= 1
+
+
+def index(seconds, keyframe_every):
+    """
+    A VideoIndex of one packet per second with a keyframe every `keyframe_every` packets.
+    """
+    return VideoIndex(float(seconds), array('i', range(0, seconds * 1000, 1000)),
+                      array('I', range(0, seconds, keyframe_every)))
+
+
+def test_frames_of_another_video_are_extracted_again(tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg()
+    monkeypatch.setattr(frame.subprocess, 'run', ffmpeg)
+    folder = tmp_path / 'frame'
+    folder.mkdir()
+    for name in ('episode1.mkv', 'episode2.mkv'):
+        (tmp_path / name).write_bytes(name.encode())
+
+    extract_missing_frames(str(tmp_path / 'episode1.mkv'), str(folder), first=1, count=4)
+    extract_missing_frames(str(tmp_path / 'episode2.mkv'), str(folder), first=1, count=4)
+
+    assert ffmpeg.ranges == [(1, 4), (1, 4)]
+    assert all(b'episode2.mkv' in path.read_bytes() for path in folder.glob('frame_*.jpg'))
+
+    extract_missing_frames(str(tmp_path / 'episode2.mkv'), str(folder), first=1, count=4)
+    assert ffmpeg.ranges == [(1, 4), (1, 4)]
+
+
+def test_resuming_a_pack_of_an_unreadable_video_reports_the_error(tmp_path, capsys, monkeypatch):
+    from framepack import PackWriter
+
+    def ffprobe(command, check=False, **kwargs):
+        raise frame.subprocess.CalledProcessError(1, command)
+
+    monkeypatch.setattr(frame.subprocess, 'run', ffprobe)
+    pack_path = str(tmp_path / 'frames.pack')
+    with PackWriter(pack_path) as pack:
+        pack.append(1, JPEG)
+    (tmp_path / 'episode.mkv').write_bytes(b'')
+
+    frame.create_frame_pack(str(tmp_path / 'episode.mkv'), pack_path)
+
+    assert 'An error occurred while extracting frames' in capsys.readouterr().out
+
+
+def test_missing_ranges():
+    assert missing_ranges(1, 10, set()) == [(1, 10)]
+    assert missing_ranges(1, 10, set(range(1, 11))) == []
+    assert missing_ranges(1, 10, {1, 2, 5, 6, 10}) == [(3, 2), (7, 3)]
+    assert missing_ranges(5, 8, {1, 2, 3, 9}) == [(5, 4)]
+
+
+def test_segments_start_at_the_closest_keyframe():
+    # Keyframes at 0, 12, 24, 36 and 48 seconds; the even split starts at 21 and 41
+    assert plan_segments(index(60, 12), 1, 1, 60, 3) == [(1, 24), (25, 12), (37, 24)]
+    assert plan_segments(index(60, 12), 1, 1, 60, 1) == [(1, 60)]
+    assert plan_segments(None, 1, 1, 60, 3) == [(1, 60)]
+
+
+def test_segments_collapse_when_keyframes_are_sparse():
+    # Only one keyframe, so every boundary lands on the first frame
+    assert plan_segments(index(60, 60), 1, 1, 60, 4) == [(1, 60)]
+
+
+def test_extracted_frames_only_counts_markers_of_this_video_and_rate(tmp_path):
+    mark_extracted(str(tmp_path), 'key', 1, 1, 3)
+    mark_extracted(str(tmp_path), 'key', 2, 4, 3)
+    mark_extracted(str(tmp_path), 'other', 1, 7, 3)
+    mark_extracted(str(tmp_path), 'key', 1, 20, 2)
+    # Malformed lines, the last one torn by a kill
+    with open(tmp_path / EXTRACTED_MARKERS, 'a') as markers:
+        markers.write('1 10 x key\n1 11\n1 12 12 ke')
+
+    assert extracted_frames(str(tmp_path), 'key', 1) == {1, 2, 3, 20, 21}
+    assert extracted_frames(str(tmp_path / 'missing'), 'key', 1) == set()
+
+
+def test_gaps_are_split_across_segments_without_exceeding_the_cap(tmp_path, monkeypatch):
+    ffmpeg = FakeFfmpeg(delay=0.05)
+    monkeypatch.setattr(frame.subprocess, 'run', ffmpeg)
+    monkeypatch.setattr(VideoIndex, 'load', classmethod(lambda cls, video_path, rebuild=False: index(60, 10)))
+    folder = tmp_path / 'frame'
+    folder.mkdir()
+    video = tmp_path / 'episode.mkv'
+    video.write_bytes(b'episode')
+    key = video_key(str(video))
+    mark_extracted(str(folder), key, 1, 11, 10)
+    mark_extracted(str(folder), key, 1, 41, 10)
+
+    extract_missing_frames(str(video), str(folder), frame_rate=1, segments=3, first=1, count=60)
+
+    # The 20-frame gap gets two of the three segments, split at the keyframe at 30 seconds
+    assert sorted(ffmpeg.ranges) == [(1, 10), (21, 10), (31, 10), (51, 10)]
+    assert ffmpeg.peak == 3
+    assert extracted_frames(str(folder), key, 1) == set(range(1, 61))
@@ -0,0 +1,72 @@
+import pytest
+
+from framepack import PackWriter, FramePack, RECORD, INDEX_SUFFIX
+
+FRAMES = {num: b'\xff\xd8' + bytes([num]) * (100 * num) + b'\xff\xd9' for num in range(1, 4)}
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    path = str(tmp_path / 'frames.pack')
+    with PackWriter(path) as pack:
+        for num, data in FRAMES.items():
+            pack.append(num, data)
+    return path
+
+
+def test_frames_read_back_as_written(pack_path):
+    with FramePack(pack_path) as pack:
+        assert pack.frames() == [1, 2, 3]
+        assert all(bytes(pack.get(num)) == data for num, data in FRAMES.items())
+        assert 4 not in pack
+        with pytest.raises(KeyError):
+            pack.get(4)
+
+
+def test_a_torn_index_record_and_trailing_data_are_dropped(pack_path):
+    # Killed while appending frame 4: its data is written, its index record only in part
+    with open(pack_path, 'ab') as data_file:
+        data_file.write(b'\xff\xd8 unreferenced')
+    with open(pack_path + INDEX_SUFFIX, 'ab') as index_file:
+        index_file.write(RECORD.pack(4, 0, 0)[:RECORD.size - 3])
+
+    with FramePack(pack_path) as pack:
+        assert pack.frames() == [1, 2, 3]
+
+    with PackWriter(pack_path) as pack:
+        end = sum(len(data) for data in FRAMES.values())
+        assert pack.offset == end
+        assert pack.append(4, b'\xff\xd8\xff\xd9') == end
+
+    with FramePack(pack_path) as pack:
+        assert pack.frames() == [1, 2, 3, 4]
+        assert bytes(pack.get(4)) == b'\xff\xd8\xff\xd9'
+        assert bytes(pack.get(3)) == FRAMES[3]
+
+
+def test_data_without_an_index_record_is_cut_off(pack_path):
+    size = sum(len(data) for data in FRAMES.values())
+    with open(pack_path, 'ab') as data_file:
+        data_file.write(b'garbage')
+
+    PackWriter(pack_path).close()
+
+    with open(pack_path, 'rb') as data_file:
+        assert len(data_file.read()) == size
+
+
+def test_writing_a_frame_again_replaces_it(pack_path):
+    with PackWriter(pack_path) as pack:
+        pack.append(2, b'\xff\xd8new\xff\xd9')
+
+    with FramePack(pack_path) as pack:
+        assert len(pack) == 3
+        assert bytes(pack.get(2)) == b'\xff\xd8new\xff\xd9'
+
+
+def test_an_empty_pack_has_no_frames(tmp_path):
+    path = str(tmp_path / 'empty.pack')
+    PackWriter(path).close()
+
+    with FramePack(path) as pack:
+        assert pack.frames() == []
@@ -0,0 +1,56 @@
+from journal import Journal, TAIL_SIZE
+
+
+def write_records(path, count):
+    with Journal(path) as journal:
+        for frame in range(1, count + 1):
+            journal.completed(frame, 'published', f"1000_{frame}")
+
+
+def test_an_empty_or_missing_journal_has_no_resume_point(tmp_path):
+    path = str(tmp_path / 'upload.journal')
+    assert Journal(path).resume_point() is None
+
+    open(path, 'w').close()
+    assert Journal(path).last_record() is None
+
+
+def test_the_last_record_is_read_from_the_tail_of_a_long_journal(tmp_path):
+    path = str(tmp_path / 'upload.journal')
+    write_records(path, 500)
+    with open(path, 'rb') as journal_file:
+        assert len(journal_file.read()) > 2 * TAIL_SIZE
+
+    assert Journal(path).last_record() == (500, 'published', '1000_500', 501)
+    assert Journal(path).resume_point() == 501
+
+
+def test_a_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / 'upload.journal')
+    write_records(path, 500)
+    with open(path, 'a') as journal_file:
+        journal_file.write('501 publ')
+
+    assert Journal(path).last_record() == (500, 'published', '1000_500', 501)
+
+
+def test_the_line_cut_by_the_start_of_the_tail_is_not_a_record(tmp_path):
+    path = str(tmp_path / 'upload.journal')
+    # The tail starts inside the first line, at a fragment that looks like a record
+    fragment = '7 published - 8\n'
+    filler = 'garbage\n' * ((TAIL_SIZE - len(fragment)) // len('garbage\n'))
+    assert len(fragment + filler) == TAIL_SIZE
+    with open(path, 'w') as journal_file:
+        journal_file.write('x' * 50 + ' ' + fragment + filler)
+
+    assert Journal(path).last_record() is None
+
+
+def test_failed_frames_are_resumed_from(tmp_path):
+    path = str(tmp_path / 'upload.journal')
+    write_records(path, 3)
+    with Journal(path) as journal:
+        journal.failed(4)
+
+    assert Journal(path).last_record() == (4, 'failed', '-', 4)
+    assert Journal(path).resume_point() == 4
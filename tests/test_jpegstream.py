@@ -0,0 +1,57 @@
+import pytest
+
+from frame import JpegStreamParser
+
+
+def segment(marker, payload):
+    return b'\xff' + bytes([marker]) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def jpeg(number):
+    """
+    A structurally valid JPEG whose marker segments hold fake end-of-image bytes and whose
+    entropy-coded data holds stuffed 0xFF bytes and restart markers.
+    """
+    return b''.join([
+        b'\xff\xd8',
+        segment(0xe0, b'JFIF\x00\xff\xd9\xff\xd9' + bytes([number])),
+        segment(0xfe, b'comment \xff\xd9 with a fake end'),
+        segment(0xdb, bytes(range(65))),
+        segment(0xda, b'\x01\x01\x00\x00\x3f\x00'),
+        b'\x12\xff\x00\x34\xff\xd0\x56\xff\x00\xff\xd7' + bytes([number]) * 7 + b'\xff\x00',
+        # Fill bytes may precede a marker
+        b'\xff\xff\xd9',
+    ])
+
+
+IMAGES = [jpeg(number) for number in range(3)]
+STREAM = b''.join(IMAGES)
+
+
+@pytest.mark.parametrize('chunk_size', range(1, len(STREAM) + 1))
+def test_images_survive_every_chunk_size(chunk_size):
+    parser = JpegStreamParser()
+    images = []
+    for offset in range(0, len(STREAM), chunk_size):
+        images += parser.feed(STREAM[offset:offset + chunk_size])
+
+    assert images == IMAGES
+    assert parser.pending == 0
+
+
+def test_an_unfinished_image_stays_pending():
+    parser = JpegStreamParser()
+
+    assert parser.feed(STREAM[:-1]) == IMAGES[:2]
+    assert parser.pending == len(IMAGES[2]) - 1
+    assert parser.feed(STREAM[-1:]) == IMAGES[2:]
+
+
+def test_a_stream_not_starting_with_an_image_is_out_of_sync():
+    with pytest.raises(ValueError):
+        JpegStreamParser().feed(b'\x00\x00' + STREAM)
+
+
+def test_garbage_between_segments_is_out_of_sync():
+    with pytest.raises(ValueError):
+        JpegStreamParser().feed(b'\xff\xd8\x00' + IMAGES[0][2:])
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from config import SCHEDULE_MIN_LEAD
+from journal import Journal
+from main import (upload_frames, upload_frames_concurrent, upload_frames_batched, upload_frames_two_phase,
+                  schedule_frames, run_daemon)
+from manifest import Manifest
+
+from conftest import JPEG
+
+
+def record_frames(folder):
+    manifest = Manifest(str(folder / 'manifest.sqlite'))
+    for num in range(1, 6):
+        manifest.record_file(num, str(folder / f"frame_{num:04}.jpg"), num - 1)
+    manifest.commit()
+    return manifest
+
+
+def test_preflight_reports_missing_and_empty_frames(tmp_path):
+    with Manifest(str(tmp_path / 'manifest.sqlite')) as manifest:
+        manifest.record(1, JPEG, 0.0, path=str(tmp_path / 'frame_0001.jpg'))
+        manifest.record(2, b'', 1.0, path=str(tmp_path / 'frame_0002.jpg'))
+
+        problems = manifest.preflight(1, 3)
+
+    assert len(problems) == 2
+    assert problems[0].startswith('1 frames not in') and problems[0].endswith(': 0003')
+    assert problems[1] == 'Empty frames: 0002'
+
+
+def test_uploaded_frames_leave_the_manifest(graph, uploader, frames, tmp_path):
+    manifest = record_frames(frames)
+    with manifest, Journal(str(tmp_path / 'upload.journal')) as journal:
+        assert manifest.preflight(1, 5) == []
+
+        assert upload_frames(1, 3, uploader, journal, prefetch=2, manifest=manifest) == 3
+
+        assert manifest.frames() == [4, 5]
+        assert len(manifest.preflight(1, 5)) == 1
+        assert manifest.preflight(4, 2) == []
+
+
+def test_frames_that_changed_since_extraction_are_not_uploaded(graph, uploader, frames, tmp_path):
+    manifest = record_frames(frames)
+    (frames / 'frame_0002.jpg').write_bytes(JPEG[:-2] + b'\0\xff\xd9')
+    journal_path = str(tmp_path / 'upload.journal')
+    with manifest, Journal(journal_path) as journal:
+        assert upload_frames(1, 5, uploader, journal, prefetch=2, manifest=manifest) == 1
+
+    assert Journal(journal_path).last_record()[:2] == (2, 'failed')
+    assert (frames / 'frame_0002.jpg').exists()
+    assert graph.stats()['requests'] == 1
+
+
+def test_resuming_a_pack_backfills_its_manifest(tmp_path):
+    from frame import create_frame_pack
+    from framepack import PackWriter
+
+    pack_path = str(tmp_path / 'frames.pack')
+    with PackWriter(pack_path) as pack, Manifest(pack_path + '.sqlite') as manifest:
+        for num in range(1, 4):
+            offset = pack.append(num, JPEG)
+            if num == 1:
+                manifest.record(num, JPEG, 0.0, pack_offset=offset)
+        # Killed before the manifest recorded frames 2 and 3
+
+    create_frame_pack(str(tmp_path / 'episode.mkv'), pack_path, first=1, count=3)
+
+    with Manifest(pack_path + '.sqlite') as manifest:
+        assert manifest.preflight(1, 3) == []
+        entries = manifest.entries(1, 3)
+    assert [entry.pack_offset for entry in entries.values()] == [0, len(JPEG), 2 * len(JPEG)]
+    assert all(entry.matches(JPEG) for entry in entries.values())
+
+
+# Every upload mode, run over frames 1 to 5 with a manifest
+MODES = {
+    'sequential': lambda uploader, journal, manifest, tmp_path:
+        upload_frames(1, 5, uploader, journal, manifest=manifest),
+    'concurrent': lambda uploader, journal, manifest, tmp_path:
+        upload_frames_concurrent(1, 5, uploader, 3, journal, manifest),
+    'batched': lambda uploader, journal, manifest, tmp_path:
+        upload_frames_batched(1, 5, uploader, 2, journal, manifest),
+    'two_phase': lambda uploader, journal, manifest, tmp_path:
+        upload_frames_two_phase(1, 5, uploader, 3, str(tmp_path / 'staged.json'), journal, manifest),
+    'schedule': lambda uploader, journal, manifest, tmp_path:
+        schedule_frames(1, 5, uploader, 1, int(time.time()) + SCHEDULE_MIN_LEAD + 60, 600, journal, manifest),
+    'daemon': lambda uploader, journal, manifest, tmp_path:
+        run_daemon(1, uploader, journal, interval=0.01, manifest=manifest),
+}
+
+
+@pytest.fixture
+def elsewhere(frames, tmp_path, monkeypatch):
+    """
+    Frames 1 to 5 and their manifest in a folder other than FRAME_DIR, which is left empty.
+    """
+    import main
+
+    folder = tmp_path / 'elsewhere'
+    folder.mkdir()
+    for path in frames.glob('frame_*.jpg'):
+        path.rename(folder / path.name)
+    monkeypatch.setattr(main, 'FRAME_DIR', str(tmp_path / 'empty'))
+    return folder
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_every_mode_reads_frames_from_the_manifest(graph, uploader, elsewhere, tmp_path, mode):
+    journal_path = str(tmp_path / 'upload.journal')
+    with record_frames(elsewhere) as manifest, Journal(journal_path) as journal:
+        MODES[mode](uploader, journal, manifest, tmp_path)
+
+        assert manifest.frames() == []
+    assert Journal(journal_path).resume_point() == 6
+    assert not list(elsewhere.glob('frame_*.jpg'))
+
+
+# The daemon retries a failed frame in its next slot instead of stopping
+@pytest.mark.parametrize('mode', [mode for mode in MODES if mode != 'daemon'])
+def test_every_mode_checks_frames_against_the_manifest(graph, uploader, elsewhere, tmp_path, mode):
+    journal_path = str(tmp_path / 'upload.journal')
+    with record_frames(elsewhere) as manifest, Journal(journal_path) as journal:
+        (elsewhere / 'frame_0003.jpg').write_bytes(JPEG + b'\0')
+        MODES[mode](uploader, journal, manifest, tmp_path)
+
+        assert 3 in manifest.frames()
+    assert Journal(journal_path).resume_point() == 3
+    assert (elsewhere / 'frame_0003.jpg').exists()
@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from ratelimit import TokenBucket
+from retry import GraphResult, RetryPolicy, classify, TRANSIENT, RATE_LIMITED, AUTH, PERMANENT
+
+
+def error(code, **fields):
+    return {'message': f"(#{code})", 'code': code, **fields}
+
+
+@pytest.mark.parametrize('status_code, error_object, expected', [
+    (200, None, None),
+    (400, error(4), RATE_LIMITED),
+    (400, error(17), RATE_LIMITED),
+    (400, error(613), RATE_LIMITED),
+    (400, error(100, error_subcode=80001), RATE_LIMITED),
+    (429, None, RATE_LIMITED),
+    (400, error(190), AUTH),
+    (400, error(200), AUTH),
+    (401, None, AUTH),
+    (500, error(1), TRANSIENT),
+    (500, error(2), TRANSIENT),
+    (400, error(100, is_transient=True), TRANSIENT),
+    (500, None, TRANSIENT),
+    (503, None, TRANSIENT),
+    (None, None, TRANSIENT),
+    (400, error(100), PERMANENT),
+    (404, None, PERMANENT),
+    (200, error(100), PERMANENT),
+])
+def test_classify(status_code, error_object, expected):
+    assert classify(status_code, error_object) == expected
+
+
+def test_result_body_is_parsed_once():
+    result = GraphResult(400, {'error': error(4)})
+
+    assert not result.ok
+    assert result.error == error(4)
+    assert result.error_class == RATE_LIMITED
+
+
+def test_backoff_stays_under_the_doubling_ceiling():
+    policy = RetryPolicy(base_delay=2.0, max_delay=30.0)
+    random.seed(6)
+
+    for attempt in range(10):
+        ceiling = min(30.0, 2.0 * 2 ** attempt)
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Full jitter spreads retries over the whole window
+        assert max(delays) > ceiling * 0.9
+        assert min(delays) < ceiling * 0.1
+
+
+@pytest.mark.parametrize('setting, error_class', [
+    ('throttle_rate', RATE_LIMITED),
+    ('error_rate', TRANSIENT),
+])
+def test_retryable_errors_are_retried_until_attempts_run_out(graph, uploader, setting, error_class):
+    setattr(graph.config, setting, 1.0)
+
+    result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.error_class == error_class
+    assert graph.stats()['requests'] == uploader.retry.max_attempts
+    assert uploader.retry.retries == {error_class: uploader.retry.max_attempts - 1}
+
+
+def test_retry_stops_once_a_request_succeeds(graph, uploader, monkeypatch):
+    graph.config.error_rate = 1.0
+    rolls = iter([0.0, 0.0])
+    monkeypatch.setattr('mock_graph.random.random', lambda: next(rolls, 1.0))
+
+    result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.ok
+    assert graph.stats()['requests'] == 3
+    assert uploader.retry.retries == {TRANSIENT: 2}
+
+
+def test_auth_errors_are_not_retried(graph, uploader):
+    graph.config.auth_error_rate = 1.0
+
+    result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.error_class == AUTH
+    assert result.error['code'] == 190
+    assert graph.stats()['requests'] == 1
+    assert uploader.retry.retries == {}
+
+
+def test_permanent_errors_are_not_retried(graph, uploader):
+    result = uploader.retry.call(lambda: uploader.post('me/unknown_edge', data={}))
+
+    assert result.error_class == PERMANENT
+    assert graph.stats()['requests'] == 1
+    assert uploader.retry.retries == {}
+
+
+def test_network_errors_count_as_transient(graph, uploader):
+    graph.shutdown()
+    graph.server_close()
+
+    result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.status_code is None
+    assert result.error_class == TRANSIENT
+    assert uploader.retry.retries == {TRANSIENT: uploader.retry.max_attempts - 1}
+
+
+def test_slow_responses_time_out_and_are_retried(graph):
+    from uploader import Uploader, RETRY_EXCEPTIONS
+
+    delays = iter([0.5, 0.5])
+    graph.config.latency = lambda: next(delays, 0.0)
+    retry = RetryPolicy(3, base_delay=0.001, max_delay=0.01, exceptions=RETRY_EXCEPTIONS)
+    with Uploader(base_url=graph.url, limiter=TokenBucket(1000, burst=1000), retry=retry,
+                  timeout=(1, 0.1)) as uploader:
+        result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.ok
+    assert retry.retries == {TRANSIENT: 2}
+
+
+def test_timeouts_count_as_transient_once_attempts_run_out(graph):
+    from uploader import Uploader, RETRY_EXCEPTIONS
+
+    graph.config.latency = lambda: 0.5
+    retry = RetryPolicy(2, base_delay=0.001, max_delay=0.01, exceptions=RETRY_EXCEPTIONS)
+    with Uploader(base_url=graph.url, limiter=TokenBucket(1000, burst=1000), retry=retry,
+                  timeout=(1, 0.1)) as uploader:
+        result = uploader.publish_photo('1', 'Frame 0001')
+
+    assert result.status_code is None
+    assert result.error_class == TRANSIENT
+    assert 'timed out' in result.error['message']
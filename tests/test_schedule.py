@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from config import SCHEDULE_MIN_LEAD
+from journal import Journal
+from main import schedule_frames
+
+
+def publish_start():
+    return int(time.time()) + SCHEDULE_MIN_LEAD + 60
+
+
+def test_schedule_frames_journals_scheduled_frames(graph, uploader, frames, tmp_path):
+    journal_path = str(tmp_path / 'upload.journal')
+    with Journal(journal_path) as journal:
+        assert schedule_frames(1, 5, uploader, concurrency=2, publish_start=publish_start(), interval=600,
+                               journal=journal) == 5
+
+    assert Journal(journal_path).last_record()[:2] == (5, 'scheduled')
+    assert not list(frames.glob('frame_*.jpg'))
+
+
+@pytest.mark.parametrize('setting', ['auth_error_rate', 'error_rate'])
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_schedule_frames_stops_at_the_first_failure(graph, uploader, frames, tmp_path, setting, concurrency):
+    setattr(graph.config, setting, 1.0)
+    journal_path = str(tmp_path / 'upload.journal')
+    with Journal(journal_path) as journal:
+        assert schedule_frames(1, 5, uploader, concurrency=concurrency, publish_start=publish_start(),
+                               interval=600, journal=journal) == 0
+
+    with open(journal_path) as journal_file:
+        assert journal_file.read().splitlines() == ['1 failed - 1']
+    assert len(list(frames.glob('frame_*.jpg'))) == 5
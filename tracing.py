@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Handed out while tracing is off, so instrumented code pays one attribute check
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'args', 'started')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.started = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.add(self.name, self.started, time.perf_counter_ns(), self.args)
+
+
+class Tracer:
+    """
+    Collects timed spans from any thread and exports them in the Chrome trace-event
+    format, which chrome://tracing, ui.perfetto.dev and speedscope open as is.
+
+    Spans opened inside another span on the same thread nest under it in the viewer,
+    so a frame span shows its read, encode, connect, send, wait, parse and remove steps.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter_ns()
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.origin = time.perf_counter_ns()
+        self.enabled = True
+
+    def span(self, name, **args):
+        """
+        :return: A context manager timing its block as `name`, with `args` shown in the viewer.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def add(self, name, started, ended, args=None):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (started - self.origin) / 1000,
+            'dur': (ended - started) / 1000,
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    def events(self):
+        with self._lock:
+            threads = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                       for tid, name in self._threads.items()]
+            return threads + list(self._events)
+
+    def export(self, path):
+        """
+        Atomically write every span recorded so far as a Chrome trace JSON file.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, trace_file, default=str)
+        os.replace(tmp_path, path)
+
+
+TRACER = Tracer()
+span = TRACER.span
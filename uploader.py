@@ -0,0 +1,239 @@
+import json
+import socket
+import threading
+import time
+from contextlib import ExitStack
+from urllib.parse import urlencode
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+import tracing
+from config import (ACCESS_TOKEN, GRAPH_API_URL, POOL_SIZE, KEEP_ALIVE, STREAM_UPLOADS, RATE_LIMIT, RATE_LIMIT_MIN,
+                    RATE_LIMIT_MAX, RATE_LIMIT_STEP, RATE_LIMIT_BURST, TARGET_USAGE, RETRY_MAX_ATTEMPTS,
+                    RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_ON, REQUEST_TIMEOUT)
+from multipart import MultipartStream
+from ratelimit import TokenBucket
+from retry import GraphResult, RetryPolicy, RATE_LIMITED
+
+# Disable warnings
+urllib3.disable_warnings()
+
+# Network errors worth retrying, raised before any response arrives
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+# Connection setup vs request timings, shared by every connection of an uploader
+class UploadStats:
+    def __init__(self, keep_latencies=False):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.connect_time = 0.0
+        self.requests = 0
+        self.request_time = 0.0
+        self.latencies = [] if keep_latencies else None
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connects += 1
+            self.connect_time += seconds
+
+    def record_request(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.request_time += seconds
+            if self.latencies is not None:
+                self.latencies.append(seconds)
+
+    def summary(self):
+        share = self.connect_time / self.request_time * 100 if self.request_time else 0.0
+        return (f"{self.requests} requests in {self.request_time:.2f}s, "
+                f"{self.connects} connections opened in {self.connect_time:.2f}s "
+                f"({share:.1f}% of request time spent on connection setup)")
+
+# Connection pool classes whose connections report their TCP/TLS setup time to stats,
+# and trace connecting, sending the request and waiting for the response headers
+def timed_pool_classes(stats):
+    class TimedConnectionMixin:
+        def connect(self):
+            started = time.perf_counter()
+            with tracing.span('connect', host=self.host):
+                super().connect()
+            stats.record_connect(time.perf_counter() - started)
+
+        def request(self, *args, **kwargs):
+            with tracing.span('send'):
+                return super().request(*args, **kwargs)
+
+        def getresponse(self, *args, **kwargs):
+            with tracing.span('wait'):
+                return super().getresponse(*args, **kwargs)
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    return {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, keep_alive=True, **kwargs):
+        self.stats = stats
+        self.keep_alive = keep_alive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keep_alive:
+            # Stop idle pooled connections from being dropped between frames
+            pool_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ])
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = timed_pool_classes(self.stats)
+
+# Form fields of a batch request running `operations` one after another. Each operation
+# depends on the previous one so the page sees them in order. Named operations come back
+# as null on success unless omit_response_on_success is off, and every operation's
+# response is needed to journal its post ID.
+def batch_payload(operations):
+    for index, operation in enumerate(operations):
+        operation['name'] = f"op{index}"
+        operation['omit_response_on_success'] = False
+        if index:
+            operation['depends_on'] = f"op{index - 1}"
+    return {
+        'access_token': ACCESS_TOKEN,
+        'batch': json.dumps(operations),
+        'include_headers': 'false',
+    }
+
+# Keeps one pooled session for the whole run so frames reuse the TCP/TLS connection
+class Uploader:
+    def __init__(self, base_url=GRAPH_API_URL, pool_size=POOL_SIZE, keep_alive=KEEP_ALIVE, limiter=None,
+                 retry=None, stream=STREAM_UPLOADS, stats=None, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.stream = stream
+        self.timeout = timeout
+        self.stats = stats or UploadStats()
+        self.limiter = limiter or TokenBucket(RATE_LIMIT, RATE_LIMIT_BURST, RATE_LIMIT_MIN, RATE_LIMIT_MAX,
+                                              RATE_LIMIT_STEP, TARGET_USAGE)
+        self.retry = retry or RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_ON,
+                                          RETRY_EXCEPTIONS)
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(self.stats, keep_alive=keep_alive,
+                                   pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    # Send one request and parse its body once into a GraphResult. The request is prepared
+    # and sent in two steps, rather than with session.post(), so encoding shows up as its own span.
+    def post(self, path, **kwargs):
+        with tracing.span('throttle'):
+            metrics.THROTTLE_WAIT_SECONDS.inc(self.limiter.acquire())
+        started = time.perf_counter()
+        try:
+            with tracing.span('encode'):
+                request = self.session.prepare_request(
+                    requests.Request('POST', f"{self.base_url}/{path.lstrip('/')}", **kwargs))
+            settings = self.session.merge_environment_settings(request.url, {}, None, None, None)
+            response = self.session.send(request, timeout=self.timeout, **settings)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats.record_request(elapsed)
+            metrics.REQUEST_SECONDS.observe(elapsed, endpoint=path or 'batch')
+        metrics.BYTES_SENT.inc(int(response.request.headers.get('Content-Length') or 0))
+        with tracing.span('parse'):
+            result = GraphResult.from_response(response)
+        self.limiter.update(response.headers, throttled=result.error_class == RATE_LIMITED)
+        metrics.RATE_LIMIT.set(self.limiter.rate)
+        metrics.API_USAGE.set(self.limiter.usage)
+        return result
+
+    # `data` holds the already-read JPEG bytes; without it the file is read from disk
+    def upload_photo(self, image_source, caption, published=True, data=None, extra=None):
+        payload = {
+            'access_token': ACCESS_TOKEN,
+            'caption': caption,
+            'published': 'true' if published else 'false',
+            **(extra or {}),
+        }
+
+        def send():
+            if self.stream:
+                with tracing.span('open'):
+                    body = MultipartStream(payload, 'source', image_source, image_source if data is None else data)
+                with body:
+                    return self.post('me/photos', data=body, headers={'Content-Type': body.content_type})
+            if data is not None:
+                # requests can't encode a memoryview; bytes() of a bytes object is a no-op
+                return self.post('me/photos', files={'source': (image_source, bytes(data))}, data=payload)
+            with open(image_source, 'rb') as image_file:
+                files = {'source': (image_source, image_file)}
+                return self.post('me/photos', files=files, data=payload)
+
+        return self.retry.call(send)
+
+    # Upload a photo that Graph API publishes by itself at `publish_time` (Unix timestamp)
+    def schedule_photo(self, image_source, caption, publish_time, data=None):
+        return self.upload_photo(image_source, caption, published=False, data=data, extra={
+            'scheduled_publish_time': publish_time,
+            'unpublished_content_type': 'SCHEDULED',
+        })
+
+    # Publish a photo uploaded with published=false as a page post
+    def publish_photo(self, photo_id, caption):
+        payload = {
+            'access_token': ACCESS_TOKEN,
+            'message': caption,
+            'attached_media[0]': json.dumps({'media_fbid': photo_id}),
+        }
+        return self.retry.call(lambda: self.post('me/feed', data=payload))
+
+    # Upload several (image_source, caption, data) frames in one Graph API batch request.
+    # `data` holds a frame's already-read JPEG bytes; when None the file is read from disk.
+    def upload_batch(self, frames, published=True):
+        payload = batch_payload([{
+            'method': 'POST',
+            'relative_url': 'me/photos',
+            'body': urlencode({'caption': caption, 'published': 'true' if published else 'false'}),
+            'attached_files': f"file{index}",
+        } for index, (image_source, caption, data) in enumerate(frames)])
+
+        def send():
+            with ExitStack() as stack:
+                files = {f"file{index}": (image_source, stack.enter_context(open(image_source, 'rb'))
+                                          if data is None else bytes(data))
+                         for index, (image_source, caption, data) in enumerate(frames)}
+                return self.post('', files=files, data=payload)
+
+        return self.retry.call(send)
+
+    # Publish several (photo_id, caption) staged photos as page posts in one batch request
+    def publish_batch(self, photos):
+        payload = batch_payload([{
+            'method': 'POST',
+            'relative_url': 'me/feed',
+            'body': urlencode({'message': caption, 'attached_media[0]': json.dumps({'media_fbid': photo_id})}),
+        } for photo_id, caption in photos])
+        return self.retry.call(lambda: self.post('', data=payload))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()